@@ -1,8 +1,12 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
-import ast
-import io
-import sys
+from typing import Optional
+from request_context import request_user, sandbox_user_key
+from sandbox import SandboxBusy
+from run_cache import run_cache
+from turtle_codec import MEDIA_TYPE, PolylineTooLarge, encode_polyline, wants_polyline
 
 router = APIRouter()
 
@@ -15,39 +19,47 @@ class LessonProgress(BaseModel):
     completed: bool
 
 @router.post("/api/run-python")
-async def run_python(data: PythonCode):
+async def run_python(data: PythonCode, request: Request, current_user: Optional[dict] = Depends(request_user)):
     """
     Execute Python turtle code and return drawing commands
+
+    Kód běží v sandboxu proti záznamové želvě (turtle_shim), takže fungují
+    smyčky, funkce i proměnné. Běh je omezen počtem kroků, ne časem.
+
+    S `Accept: application/x-turtle-polyline` vrátí úspěšný běh v binárním
+    formátu (viz turtle_codec); chyby a příliš velké kresby jsou vždy JSON.
     """
+    user_key = sandbox_user_key(current_user)
     try:
-        # Parse code to extract turtle commands
-        commands = []
-        tree = ast.parse(data.code)
-        
-        # Simple turtle command extraction
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Call):
-                if isinstance(node.func, ast.Attribute):
-                    if node.func.attr == 'forward' and node.args:
-                        distance = ast.literal_eval(node.args[0])
-                        commands.append({'type': 'forward', 'distance': distance})
-                    elif node.func.attr == 'right' and node.args:
-                        degrees = ast.literal_eval(node.args[0])
-                        commands.append({'type': 'right', 'degrees': degrees})
-                    elif node.func.attr == 'left' and node.args:
-                        degrees = ast.literal_eval(node.args[0])
-                        commands.append({'type': 'left', 'degrees': degrees})
-        
-        return {
-            'success': True,
-            'commands': commands
-        }
-        
+        result = await run_cache.run(data.code, user_key=user_key, mode="turtle")
+    except SandboxBusy as e:
+        # Stejné tělo jako ostatní chyby (klient ho zobrazí), ale 429 — přetížení, ne chyba programu
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=429)
     except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+    if result.get("return_code") != 0:
         return {
             'success': False,
-            'error': str(e)
+            'error': result.get("error", ""),
+            'output': result.get("output", ""),
+            'commands': result.get("commands", [])
         }
+    if wants_polyline(request.headers.get("accept")):
+        try:
+            # Simulace velké kresby trvá desítky ms — ne na event loopu
+            content = await asyncio.get_running_loop().run_in_executor(
+                None, encode_polyline, result["commands"], result["output"]
+            )
+        except PolylineTooLarge as e:
+            print(f"⚠️ Polyline fallback to JSON: {e}")
+        else:
+            return Response(content=content, media_type=MEDIA_TYPE, headers={"Vary": "Accept"})
+    return {
+        'success': True,
+        'commands': result["commands"],
+        'output': result["output"]
+    }
 
 @router.post("/api/complete-lesson")
 async def complete_lesson(progress: LessonProgress):
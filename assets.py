@@ -0,0 +1,170 @@
+"""
+Statické soubory s otiskem obsahu v názvu a předkomprimovanými variantami.
+
+build_assets.py při buildu zkopíruje každý soubor ze static/ do static/dist/
+jako `název.<hash>.přípona`, u textových souborů přidá `.br` a `.gz` a zapíše
+manifest (původní cesta → otisknutá). Šablony adresy překládají přes
+asset_url('css/style.css'); bez buildu vrací obyčejnou /static/ adresu.
+
+PrecompressedStaticFiles pak podle Accept-Encoding pošle hotovou .br/.gz
+variantu (nic se nekomprimuje za běhu) a otisknutým souborům dá
+`Cache-Control: immutable` — nový obsah = nový název.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import stat
+import time
+from typing import Dict, Optional, Tuple
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+
+try:
+    import brotli  # volitelné: bez něj jen .gz
+except ImportError:
+    brotli = None
+
+DIST_DIR = "dist"
+MANIFEST = "manifest.json"
+# Jen textové formáty — obrázky a videa už komprimované jsou
+COMPRESSIBLE = {".css", ".js", ".mjs", ".json", ".svg", ".html", ".txt", ".xml", ".map", ".wasm"}
+# Komprimovaná varianta se uloží, jen když ušetří aspoň 10 %
+MIN_SAVING = 0.9
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+
+def _hashed_name(rel_path: str, data: bytes) -> str:
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+def build(static_dir: str = "static") -> Dict[str, Dict]:
+    """Postaví static/dist/ a manifest. Vrátí {cesta: {hashed, size, gz, br}}."""
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    report: Dict[str, Dict] = {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != dist_dir)
+        for name in sorted(files):
+            src = os.path.join(root, name)
+            rel_path = os.path.relpath(src, static_dir).replace(os.sep, "/")
+            with open(src, "rb") as f:
+                data = f.read()
+            hashed = _hashed_name(rel_path, data)
+            dst = os.path.join(dist_dir, hashed)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            with open(dst, "wb") as f:
+                f.write(data)
+            entry = {"hashed": f"{DIST_DIR}/{hashed}", "size": len(data), "gz": None, "br": None}
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE:
+                variants = {"gz": gzip.compress(data, compresslevel=9, mtime=0)}
+                if brotli is not None:
+                    variants["br"] = brotli.compress(data, quality=11)
+                for suffix, compressed in variants.items():
+                    if len(compressed) <= len(data) * MIN_SAVING:
+                        with open(f"{dst}.{suffix}", "wb") as f:
+                            f.write(compressed)
+                        entry[suffix] = len(compressed)
+            report[rel_path] = entry
+    manifest = {path: entry["hashed"] for path, entry in report.items()}
+    with open(os.path.join(dist_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return report
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Accept-Encoding → {kódování: q}."""
+    encodings: Dict[str, float] = {}
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        encodings[name] = q
+    return encodings
+
+class AssetManifest:
+    """Překlad cest ve static/ na otisknuté adresy (podle static/dist/manifest.json)."""
+
+    def __init__(self, static_dir: str = "static", url_prefix: str = "/static", check_interval: float = 2.0):
+        self.path = os.path.join(static_dir, DIST_DIR, MANIFEST)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.check_interval = check_interval
+        self._mtime: Optional[float] = None
+        self._checked_at = float("-inf")
+        self._entries: Dict[str, str] = {}
+        self.reload()
+
+    def reload(self):
+        """Načte manifest znovu, pokud se od minula změnil (nový build)."""
+        self._checked_at = time.monotonic()
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            self._mtime, self._entries = None, {}
+            return
+        if mtime != self._mtime:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+            self._mtime = mtime
+
+    def url(self, path: str) -> str:
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self.reload()
+        path = path.lstrip("/")
+        return f"{self.url_prefix}/{self._entries.get(path, path)}"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles, které posílají předkomprimované .br/.gz varianty a otisknutým souborům immutable cache."""
+
+    # Pořadí = preference, když klient umí obojí
+    ENCODINGS: Tuple[Tuple[str, str], ...] = (("br", ".br"), ("gzip", ".gz"))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.precompressed_hits = 0
+
+    async def get_response(self, path: str, scope) -> Response:
+        immutable = path.replace(os.sep, "/").startswith(f"{DIST_DIR}/")
+        if immutable and scope["method"] in ("GET", "HEAD"):
+            response = self._precompressed(path, scope)
+            if response is not None:
+                return response
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE if immutable else REVALIDATE
+            if immutable and os.path.splitext(path)[1].lower() in COMPRESSIBLE:
+                response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    def _precompressed(self, path: str, scope) -> Optional[Response]:
+        header = Headers(scope=scope).get("accept-encoding", "")
+        accepted = {name for name, q in accepted_encodings(header).items() if q > 0}
+        for encoding, suffix in self.ENCODINGS:
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = self.lookup_path(path + suffix)
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+            media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            response = FileResponse(full_path, stat_result=stat_result, method=scope["method"],
+                                    media_type=media_type)
+            response.headers["Content-Encoding"] = encoding
+            response.headers["Vary"] = "Accept-Encoding"
+            response.headers["Cache-Control"] = IMMUTABLE
+            self.precompressed_hits += 1
+            return response
+        return None
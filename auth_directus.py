@@ -1,20 +1,49 @@
+import hashlib
+import time
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
 from fastapi import Request
 from config import settings
+from cache import TTLCache
+from jwt_backend import InvalidToken, jwt_backend
+
+# Ověřené tokeny (klíč = sha256 tokenu) — opakovaný požadavek se stejnou
+# cookie přeskočí HMAC i parsování. Jen v paměti procesu, nikdy ve sdílené cache.
+_verified_tokens = TTLCache(default_ttl=settings.JWT_CACHE_TTL, max_size=settings.JWT_CACHE_SIZE)
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode["exp"] = expire
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    return jwt_backend.encode(to_encode, settings.SECRET_KEY, settings.ALGORITHM)
 
 def verify_token(token: str) -> Optional[dict]:
+    key = _token_key(token)
+    cached = _verified_tokens.get(key)
+    if cached is not None:
+        if cached.get("exp", 0) > time.time():
+            return dict(cached)
+        _verified_tokens.delete(key)
     try:
-        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-    except JWTError:
+        payload = jwt_backend.decode(token, settings.SECRET_KEY, [settings.ALGORITHM])
+    except InvalidToken:
         return None
+    # Položka nesmí přežít exp tokenu
+    ttl = min(settings.JWT_CACHE_TTL, payload.get("exp", 0) - time.time())
+    if ttl > 0:
+        _verified_tokens.set(key, payload, ttl=ttl)
+    return dict(payload)
+
+def forget_token(token: Optional[str]):
+    """Zahodí token z cache ověřených tokenů (při odhlášení)."""
+    if token:
+        _verified_tokens.delete(_token_key(token))
+
+def token_cache_stats() -> dict:
+    return _verified_tokens.stats()
 
 async def get_current_user_optional(request: Request) -> Optional[dict]:
     """Vrátí dict s user info z cookie (nebo None pro nepřihlášené)."""
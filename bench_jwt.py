@@ -0,0 +1,72 @@
+"""
+Benchmark JWT backendů (jwt_backend.py): tokenů za sekundu pro encode a decode.
+
+Nejdřív ověří, že tokeny jsou mezi backendy zaměnitelné (token vydaný
+jedním přečte každý jiný se stejnými claims), pak měří. Nenainstalované
+backendy přeskočí.
+
+    python bench_jwt.py [--iterations 20000]
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from config import settings
+from jwt_backend import BACKENDS, InvalidToken
+
+CLAIMS = {"sub": "00000000-0000-0000-0000-000000000001", "email": "terka@example.com", "nickname": "Terka"}
+
+def available() -> dict:
+    backends = {}
+    for name, cls in BACKENDS.items():
+        try:
+            backends[name] = cls()
+        except ImportError as e:
+            print(f"  {name}: přeskočeno ({e})")
+    return backends
+
+def claims() -> dict:
+    return {**CLAIMS, "exp": datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)}
+
+def check_compatibility(backends: dict):
+    key, alg = settings.SECRET_KEY, settings.ALGORITHM
+    expired = {**CLAIMS, "exp": datetime.utcnow() - timedelta(minutes=1)}
+    for issuer in backends.values():
+        token = issuer.encode(claims(), key, alg)
+        old = issuer.encode(expired, key, alg)
+        for reader in backends.values():
+            decoded = reader.decode(token, key, [alg])
+            assert {k: decoded[k] for k in CLAIMS} == CLAIMS, (issuer.name, reader.name)
+            assert isinstance(decoded["exp"], int), (issuer.name, reader.name)
+            for bad in (old, token[:-2] + "xx"):
+                try:
+                    reader.decode(bad, key, [alg])
+                except InvalidToken:
+                    continue
+                raise AssertionError(f"{reader.name} přijal neplatný token od {issuer.name}")
+    print(f"  kompatibilita: OK ({', '.join(backends)})\n")
+
+def rate(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+def run(iterations: int):
+    backends = available()
+    check_compatibility(backends)
+    key, alg = settings.SECRET_KEY, settings.ALGORITHM
+    print(f"{'backend':<10}{'encode /s':>14}{'decode /s':>14}")
+    for name, backend in backends.items():
+        payload = claims()
+        token = backend.encode(payload, key, alg)
+        encode = rate(lambda: backend.encode(payload, key, alg), iterations)
+        decode = rate(lambda: backend.decode(token, key, [alg]), iterations)
+        print(f"{name:<10}{encode:>14,.0f}{decode:>14,.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.iterations)
@@ -0,0 +1,41 @@
+"""
+Mikrobenchmark ověření JWT: plné dekódování proti cache ověřených tokenů.
+
+Simuluje opakované požadavky se stejnou cookie (typický student) a pro
+srovnání i studenou cache (každý token jiný).
+
+    python bench_jwt_cache.py [--iterations 20000]
+"""
+
+import argparse
+import time
+import auth_directus
+from auth_directus import create_access_token, verify_token
+from config import settings
+from jwt_backend import jwt_backend
+
+def timed(label: str, fn, iterations: int):
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28}{elapsed / iterations * 1e6:>10.2f} µs{iterations / elapsed:>14,.0f} /s")
+
+def run(iterations: int):
+    token = create_access_token({"sub": "00000000-0000-0000-0000-000000000001", "email": "terka@example.com"})
+    cold = [create_access_token({"sub": str(i), "email": f"s{i}@example.com"}) for i in range(iterations)]
+    print(f"{iterations} ověření\n")
+    print(f"{'varianta':<28}{'na token':>13}{'tokenů':>16}")
+    timed(f"{jwt_backend.name} decode", lambda i: jwt_backend.decode(token, settings.SECRET_KEY, [settings.ALGORITHM]),
+          iterations)
+    auth_directus._verified_tokens.clear()
+    timed("verify_token (stejný token)", lambda i: verify_token(token), iterations)
+    auth_directus._verified_tokens.clear()
+    timed("verify_token (studená)", lambda i: verify_token(cold[i]), iterations)
+    print(f"\ncache: {auth_directus.token_cache_stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.iterations)
@@ -0,0 +1,85 @@
+"""
+Benchmark sestavení pokroku studenta pro stránky / a /python.
+
+Directus je nahrazen httpx.MockTransport s umělou latencí, cache pokroku se
+před každým požadavkem maže (měříme studený render). Porovnává původní
+sekvenční načítání (pokrok, pak uživatel) se souběžným dotazem s `fields=`.
+
+    python bench_progress.py [--latency 0.05] [--requests 50]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+import main
+from auth_directus import create_access_token
+from cache import progress_cache
+from data_service import DataService
+from directus_client import directus
+from schemas import StudentProgress
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+def mock_directus(latency: float) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        path = request.url.path
+        if path.startswith("/items/user_progress"):
+            return httpx.Response(200, json={"data": [
+                {"id": i, "user": USER_ID, "lesson": str(i), "completed": True, "completion_percentage": 100}
+                for i in range(1, 4)
+            ]})
+        if path.startswith("/users/"):
+            return httpx.Response(200, json={"data": {"id": USER_ID, "first_name": "Terka", "email": "terka@example.com"}})
+        return httpx.Response(200, json={"data": []})
+    return httpx.MockTransport(handler)
+
+async def sequential_progress(self, user_id: str) -> StudentProgress:
+    """Původní implementace — dva dotazy za sebou, bez projekce polí."""
+    progress_data = await directus.get_user_progress(user_id)
+    completed_lessons = [p["lesson"] for p in progress_data if p.get("completed")]
+    user_info = await directus.get_user_by_id(user_id)
+    display_name = ""
+    if user_info:
+        display_name = user_info.get("first_name") or user_info.get("email", "Student").split("@")[0]
+    return StudentProgress(name=display_name or "Student", completed_lessons=completed_lessons,
+                           current_level="Úvod")
+
+async def measure(client: httpx.AsyncClient, path: str, requests: int) -> list:
+    timings = []
+    for _ in range(requests):
+        progress_cache.clear()
+        start = time.perf_counter()
+        response = await client.get(path)
+        timings.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    return timings
+
+def percentile(values: list, p: float) -> float:
+    return statistics.quantiles(values, n=100)[int(p) - 1] if len(values) > 1 else values[0]
+
+async def run(latency: float, requests: int):
+    directus._client = httpx.AsyncClient(transport=mock_directus(latency))
+    token = create_access_token({"sub": USER_ID, "email": "terka@example.com"})
+    app = httpx.ASGITransport(app=main.app)
+    current = DataService.get_user_progress
+    print(f"Directus latence {latency * 1000:.0f} ms, {requests} požadavků na route\n")
+    print(f"{'route':<10}{'varianta':<14}{'p50 ms':>10}{'p95 ms':>10}")
+    async with httpx.AsyncClient(transport=app, base_url="http://bench", cookies={"access_token": token}) as client:
+        for path in ("/", "/python"):
+            for label, impl in (("sekvenčně", sequential_progress), ("souběžně", current)):
+                DataService.get_user_progress = impl
+                timings = await measure(client, path, requests)
+                print(f"{path:<10}{label:<14}{percentile(timings, 50):>10.1f}{percentile(timings, 95):>10.1f}")
+    DataService.get_user_progress = current
+    await directus.aclose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05, help="latence Directusu v sekundách")
+    parser.add_argument("--requests", type=int, default=50, help="počet požadavků na route a variantu")
+    args = parser.parse_args()
+    asyncio.run(run(args.latency, args.requests))
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Build statických souborů: otisk obsahu v názvu + předkomprimované .br/.gz.
+
+Výstup jde do static/dist/ (včetně manifest.json), šablony na něj odkazují
+přes asset_url(). Spouští se při buildu / deploy, po každé změně ve static/.
+
+    python build_assets.py [--static static]
+"""
+
+import argparse
+import time
+from assets import brotli, build
+
+def _size(n) -> str:
+    return "—" if n is None else f"{n / 1024:.1f} kB"
+
+def main():
+    parser = argparse.ArgumentParser(description="Otisknuté a předkomprimované statické soubory")
+    parser.add_argument("--static", default="static", help="adresář se statickými soubory")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    report = build(args.static)
+    print(f"{'soubor':<58}{'původní':>10}{'gzip':>10}{'brotli':>10}")
+    for path, entry in report.items():
+        print(f"{entry['hashed']:<58}{_size(entry['size']):>10}{_size(entry['gz']):>10}{_size(entry['br']):>10}")
+    total = sum(e["size"] for e in report.values())
+    print(f"\n✅ {len(report)} souborů ({total / 1024:.0f} kB) za {(time.perf_counter() - started) * 1000:.0f} ms")
+    if brotli is None:
+        print("⚠️ Balíček brotli není nainstalovaný — jen .gz varianty (pip install brotli)")
+
+if __name__ == "__main__":
+    main()
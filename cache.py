@@ -1,28 +1,351 @@
+import pickle
+import sqlite3
+import threading
 import time
-from typing import Any, Optional, Dict, Tuple
+from collections import OrderedDict
+from typing import Any, Optional, Dict, List, Tuple
+from config import settings
 
-class TTLCache:
-    def __init__(self, default_ttl: int = 60):
+class CacheBackend:
+    """Rozhraní úložiště cache. Implementace: paměť, SQLite soubor, Redis."""
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: int = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def poll_invalidations(self) -> List[str]:
+        """Klíče smazané jinými workery od posledního volání (u sdílených úložišť)."""
+        return []
+
+    def stats(self) -> Dict:
+        return {}
+
+class TTLCache(CacheBackend):
+    """Omezená LRU cache s TTL pro každý klíč (v paměti jednoho procesu).
+
+    - nejvýš `max_size` položek, při přeplnění se vyhodí nejdéle nepoužitá
+    - prošlé položky se mažou při čtení a průběžně úklidem každých `sweep_interval` s
+    - počítadla hit/miss/eviction pro monitoring
+    """
+
+    def __init__(self, default_ttl: int = 60, max_size: int = 10_000, sweep_interval: int = 30):
         self.default_ttl = default_ttl
-        self._store: Dict[str, Tuple[Any, float]] = {}
+        self.max_size = max_size
+        self.sweep_interval = sweep_interval
+        self._store: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
 
     def get(self, key: str) -> Optional[Any]:
-        entry = self._store.get(key)
-        if entry:
-            value, expires_at = entry
-            if time.time() < expires_at:
-                return value
-            del self._store[key]
+        now = time.monotonic()
+        with self._lock:
+            self._maybe_sweep(now)
+            entry = self._store.get(key)
+            if entry:
+                value, expires_at = entry
+                if now < expires_at:
+                    self._store.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._store[key]
+                self.expirations += 1
+            self.misses += 1
         return None
 
     def set(self, key: str, value: Any, ttl: int = None):
-        self._store[key] = (value, time.time() + (ttl or self.default_ttl))
+        now = time.monotonic()
+        with self._lock:
+            self._maybe_sweep(now)
+            self._store[key] = (value, now + (ttl or self.default_ttl))
+            self._store.move_to_end(key)
+            while len(self._store) > self.max_size:
+                self._store.popitem(last=False)
+                self.evictions += 1
 
     def delete(self, key: str):
-        self._store.pop(key, None)
+        with self._lock:
+            self._store.pop(key, None)
 
     def clear(self):
-        self._store.clear()
+        with self._lock:
+            self._store.clear()
+
+    def sweep(self) -> int:
+        """Smaže všechny prošlé položky. Vrátí jejich počet."""
+        with self._lock:
+            return self._sweep(time.monotonic())
+
+    def _maybe_sweep(self, now: float):
+        if now - self._last_sweep >= self.sweep_interval:
+            self._sweep(now)
+
+    def _sweep(self, now: float) -> int:
+        expired = [k for k, (_, expires_at) in self._store.items() if expires_at <= now]
+        for k in expired:
+            del self._store[k]
+        self.expirations += len(expired)
+        self._last_sweep = now
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._store),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+MemoryBackend = TTLCache
+
+class SQLiteBackend(CacheBackend):
+    """Cache sdílená přes SQLite soubor — pro více workerů na jednom stroji.
+
+    Smazání klíče se zapíše i do tabulky `invalidations`, ze které si
+    ostatní workery čtou, co mají zahodit ze své lokální vrstvy.
+    """
+
+    def __init__(self, path: str, default_ttl: int = 60):
+        self.path = path
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS invalidations (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, ts REAL)"
+        )
+        row = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM invalidations").fetchone()
+        self._last_invalidation = row[0]
+        self._last_prune = time.time()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: int = None):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        expires_at = time.time() + (ttl or self.default_ttl)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, blob, expires_at)
+            )
+            self._maybe_prune()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.execute("INSERT INTO invalidations (key, ts) VALUES (?, ?)", (key, time.time()))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.execute("INSERT INTO invalidations (key, ts) VALUES ('*', ?)", (time.time(),))
+
+    def poll_invalidations(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, key FROM invalidations WHERE id > ? ORDER BY id", (self._last_invalidation,)
+            ).fetchall()
+        if rows:
+            self._last_invalidation = rows[-1][0]
+        return [key for _, key in rows]
+
+    def _maybe_prune(self):
+        # Jednou za minutu smaže prošlé položky a staré záznamy o invalidacích
+        now = time.time()
+        if now - self._last_prune < 60:
+            return
+        self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+        self._conn.execute("DELETE FROM invalidations WHERE ts < ?", (now - 3600,))
+        self._last_prune = now
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "size": size, "hits": self.hits, "misses": self.misses}
+
+class RedisBackend(CacheBackend):
+    """Cache sdílená přes Redis (nebo kompatibilní server — KeyDB, Dragonfly, ...).
+
+    Invalidace se rozesílají přes pub/sub kanál. Vyžaduje balíček `redis`.
+    """
+
+    CHANNEL = "ngc:cache:invalidate"
+
+    def __init__(self, url: str, default_ttl: int = 60, prefix: str = "ngc:"):
+        import redis  # volitelná závislost
+        self.url = url
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url, socket_timeout=1.0)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self.CHANNEL)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        blob = self._redis.get(self.prefix + key)
+        if blob is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(blob)
+
+    def set(self, key: str, value: Any, ttl: int = None):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._redis.set(self.prefix + key, blob, ex=int(ttl or self.default_ttl))
+
+    def delete(self, key: str):
+        self._redis.delete(self.prefix + key)
+        self._redis.publish(self.CHANNEL, key)
+
+    def clear(self):
+        keys = list(self._redis.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self._redis.delete(*keys)
+        self._redis.publish(self.CHANNEL, "*")
+
+    def poll_invalidations(self) -> List[str]:
+        keys = []
+        while True:
+            message = self._pubsub.get_message(timeout=0)
+            if not message:
+                return keys
+            data = message.get("data")
+            keys.append(data.decode() if isinstance(data, bytes) else str(data))
+
+    def stats(self) -> Dict:
+        return {"backend": "redis", "url": self.url.split("@")[-1], "hits": self.hits, "misses": self.misses}
+
+class TieredCache(CacheBackend):
+    """Lokální LRU vrstva před sdíleným úložištěm.
+
+    Čtení jde nejdřív do paměti procesu, pak do sdíleného úložiště. Smazání
+    se propíše do úložiště a ostatní workery ho dostanou přes
+    `poll_invalidations()` (kontrolováno nejvýš každých `poll_interval` s).
+    """
+
+    def __init__(self, local: TTLCache, shared: CacheBackend, local_ttl: int = 5, poll_interval: float = 0.2):
+        self.local = local
+        self.shared = shared
+        self.local_ttl = local_ttl
+        self.poll_interval = poll_interval
+        self._last_poll = 0.0
+        self.errors = 0
+
+    def _sync_invalidations(self):
+        now = time.monotonic()
+        if now - self._last_poll < self.poll_interval:
+            return
+        self._last_poll = now
+        for key in self.shared.poll_invalidations():
+            if key == "*":
+                self.local.clear()
+            else:
+                self.local.delete(key)
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            self._sync_invalidations()
+        except Exception:
+            self.errors += 1
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        try:
+            value = self.shared.get(key)
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ Shared cache get error: {e}")
+            return None
+        if value is not None:
+            self.local.set(key, value, ttl=self.local_ttl)
+        return value
+
+    def set(self, key: str, value: Any, ttl: int = None):
+        self.local.set(key, value, ttl=min(ttl or self.local_ttl, self.local_ttl))
+        try:
+            self.shared.set(key, value, ttl=ttl)
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ Shared cache set error: {e}")
+
+    def delete(self, key: str):
+        self.local.delete(key)
+        try:
+            self.shared.delete(key)
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ Shared cache delete error: {e}")
+
+    def clear(self):
+        self.local.clear()
+        try:
+            self.shared.clear()
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ Shared cache clear error: {e}")
+
+    def stats(self) -> Dict:
+        try:
+            shared = self.shared.stats()
+        except Exception as e:
+            shared = {"error": str(e)}
+        return {"local": self.local.stats(), "shared": shared, "errors": self.errors}
+
+def is_shared(cache: CacheBackend) -> bool:
+    """Vidí zápisy do `cache` i ostatní workery (sqlite / redis)?"""
+    return isinstance(cache, TieredCache)
+
+def make_cache(default_ttl: int = 60, max_size: int = 10_000) -> CacheBackend:
+    """Vytvoří cache podle CACHE_BACKEND (memory | sqlite | redis).
+
+    Pokud sdílené úložiště nejde otevřít, spadne zpět na cache v paměti.
+    """
+    backend = settings.CACHE_BACKEND
+    local = TTLCache(default_ttl=default_ttl, max_size=max_size)
+    try:
+        if backend == "sqlite":
+            return TieredCache(local, SQLiteBackend(settings.CACHE_URL, default_ttl=default_ttl))
+        if backend == "redis":
+            return TieredCache(local, RedisBackend(settings.CACHE_URL, default_ttl=default_ttl))
+    except Exception as e:
+        print(f"⚠️ Cache backend '{backend}' nelze použít ({e}) — používám paměť procesu")
+    return local
 
 # Sdílené instance
-progress_cache = TTLCache(default_ttl=60)   # pokrok studenta: 60 s
+progress_cache = make_cache(default_ttl=60, max_size=5_000)   # pokrok studenta: 60 s
+# Poslední známý pokrok pro výpadky Directusu — žije mnohem déle než progress_cache
+progress_lkg_cache = make_cache(default_ttl=settings.PROGRESS_LKG_TTL, max_size=20_000)
@@ -0,0 +1,131 @@
+"""
+Počítání volání Directusu v rámci jednoho HTTP požadavku.
+
+Middleware založí pro každý požadavek počítadlo v contextvar, DirectusClient
+do něj zapisuje každé skutečně odeslané volání (endpoint, bajty, čas).
+Po dokončení se výsledek přičte ke statistikám route a pokud route překročí
+rozpočet — celkem volání, nebo opakované volání stejného endpointu (N+1) —
+zaloguje se varování.
+"""
+
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+from starlette.routing import Match
+
+class RequestCalls:
+    def __init__(self):
+        self.calls = 0
+        self.bytes = 0
+        self.upstream_ms = 0.0
+        self.endpoints: Dict[str, int] = {}
+
+    def record(self, endpoint: str, nbytes: int, elapsed: float):
+        self.calls += 1
+        self.bytes += nbytes
+        self.upstream_ms += elapsed * 1000
+        self.endpoints[endpoint] = self.endpoints.get(endpoint, 0) + 1
+
+_current: ContextVar[Optional[RequestCalls]] = ContextVar("directus_calls", default=None)
+
+async def detached(coro):
+    """Obal pro úlohy spuštěné z požadavku, které s ním nekončí (ensure_future).
+
+    Úloha zdědí kopii kontextu i s počítadlem — bez resetu by jí volání
+    (sdílená single-flight, obnova na pozadí) šla na vrub cizímu požadavku,
+    případně až po jeho vyúčtování.
+    """
+    _current.set(None)
+    return await coro
+
+def record_call(endpoint: str, nbytes: int, elapsed: float):
+    """Zapíše volání Directusu do počítadla aktuálního požadavku (mimo požadavek nic)."""
+    calls = _current.get()
+    if calls is not None:
+        calls.record(endpoint, nbytes, elapsed)
+
+class RouteStats:
+    """Souhrn volání Directusu po route (šabloně cesty, ne konkrétní URL)."""
+
+    def __init__(self):
+        self.routes: Dict[str, Dict] = {}
+
+    def add(self, route: str, calls: RequestCalls, over_budget: bool, n_plus_one: bool):
+        stats = self.routes.setdefault(route, {
+            "requests": 0, "calls": 0, "max_calls": 0, "bytes": 0, "upstream_ms": 0.0,
+            "over_budget": 0, "n_plus_one": 0, "endpoints": {},
+        })
+        stats["requests"] += 1
+        stats["calls"] += calls.calls
+        stats["max_calls"] = max(stats["max_calls"], calls.calls)
+        stats["bytes"] += calls.bytes
+        stats["upstream_ms"] += calls.upstream_ms
+        stats["over_budget"] += over_budget
+        stats["n_plus_one"] += n_plus_one
+        for endpoint, count in calls.endpoints.items():
+            stats["endpoints"][endpoint] = stats["endpoints"].get(endpoint, 0) + count
+
+    def summary(self) -> Dict[str, Dict]:
+        result = {}
+        for route, stats in sorted(self.routes.items(), key=lambda item: -item[1]["calls"]):
+            n = stats["requests"]
+            result[route] = {
+                **stats,
+                "avg_calls": round(stats["calls"] / n, 2),
+                "avg_bytes": stats["bytes"] // n,
+                "avg_upstream_ms": round(stats["upstream_ms"] / n, 1),
+                "upstream_ms": round(stats["upstream_ms"], 1),
+            }
+        return result
+
+route_stats = RouteStats()
+
+def route_path(app, scope) -> str:
+    """Šablona cesty (/kurz/{course_id}) — aby se statistiky neštěpily podle parametrů."""
+    route = scope.get("route")
+    if route is not None and hasattr(route, "path"):
+        return route.path
+    # Mount (např. /static) si do scope přepíše root_path — párujeme proti původnímu
+    scope = {**scope, "root_path": scope.get("app_root_path", scope.get("root_path", ""))}
+    for route in getattr(getattr(app, "router", None), "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+    return scope["path"]
+
+class CallBudgetMiddleware:
+    """ASGI middleware: rozpočet volání Directusu na jeden požadavek.
+
+    `max_calls` — víc volání na požadavek je podezřelé;
+    `max_same_endpoint` — stejný endpoint volaný víckrát = pravděpodobně N+1.
+    """
+
+    def __init__(self, app, max_calls: int = 4, max_same_endpoint: int = 2):
+        self.app = app
+        self.max_calls = max_calls
+        self.max_same_endpoint = max_same_endpoint
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        calls = RequestCalls()
+        token = _current.set(calls)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            if calls.calls:
+                self._finish(scope, calls, time.perf_counter() - started)
+
+    def _finish(self, scope, calls: RequestCalls, elapsed: float):
+        route = route_path(scope.get("app"), scope)
+        repeated = {e: n for e, n in calls.endpoints.items() if n > self.max_same_endpoint}
+        over_budget = calls.calls > self.max_calls
+        route_stats.add(route, calls, over_budget, bool(repeated))
+        if over_budget or repeated:
+            detail = ", ".join(f"{e}×{n}" for e, n in sorted(calls.endpoints.items(), key=lambda i: -i[1]))
+            print(f"⚠️ Directus budget: {scope['method']} {route} — {calls.calls} volání "
+                  f"(limit {self.max_calls}), {calls.bytes} B, {calls.upstream_ms:.0f} ms "
+                  f"z {elapsed * 1000:.0f} ms [{detail}]")
@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Dict, List, Optional
+from call_budget import detached
+from config import settings
+from directus_client import directus
+from singleflight import SingleFlight
+
+def build_catalog(courses_data: List[Dict]) -> Dict[str, Dict]:
+    """Převede kolekci `courses` z Directusu na slovník {course_id: kurz}."""
+    return {
+        course["course_id"]: {
+            "id": course["id"],
+            "title": course["title"],
+            "description": course["description"],
+            "level": course["level"],
+            "lessons": [
+                {
+                    "id": lesson["id"],
+                    "title": lesson["title"],
+                    "description": lesson["description"],
+                    "lesson_number": lesson["lesson_number"]
+                }
+                for lesson in course.get("lessons", [])
+            ]
+        }
+        for course in courses_data
+    }
+
+class CourseCatalog:
+    """Snapshot katalogu kurzů v paměti procesu (stale-while-revalidate).
+
+    Stránky dostanou vždy okamžitě poslední snapshot; pokud je starší než
+    `refresh_interval`, obnoví se na pozadí. Celý katalog se znovu stahuje jen
+    tehdy, když se změní verze obsahu v Directusu (ETag / poslední revize).
+    """
+
+    COLLECTIONS = ["courses", "lessons"]
+
+    def __init__(self, refresh_interval: int = 300):
+        self.refresh_interval = refresh_interval
+        self.version: Optional[str] = None
+        self._courses: Optional[Dict[str, Dict]] = None
+        self._checked_at = 0.0
+        self._loaded_at = 0.0
+        self._flight = SingleFlight()
+        self._background: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self.checks = 0
+        self.reloads = 0
+        self.stale_served = 0
+
+    async def get(self) -> Dict[str, Dict]:
+        if self._courses is None:
+            # Studený start — jediný případ, kdy se čeká na Directus
+            await self.refresh()
+            return self._courses or {}
+        if time.monotonic() - self._checked_at > self.refresh_interval:
+            self.stale_served += 1
+            self._refresh_in_background()
+        return self._courses
+
+    async def has_lesson(self, lesson_id: int) -> Optional[bool]:
+        """Je lekce v katalogu? None, když katalog zatím nejde načíst (nelze ověřit)."""
+        courses = await self.get()
+        if not courses:
+            return None
+        return any(lesson["id"] == lesson_id for course in courses.values() for lesson in course["lessons"])
+
+    def _refresh_in_background(self):
+        if self._background is None or self._background.done():
+            self._background = asyncio.ensure_future(detached(self.refresh()))
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Zkontroluje verzi a při změně znovu načte katalog. Vrátí True při načtení."""
+        return await self._flight.do(("refresh", force), lambda: self._refresh(force))
+
+    async def _refresh(self, force: bool) -> bool:
+        self.checks += 1
+        version = await directus.get_content_version(self.COLLECTIONS)
+        if not force and version is not None and version == self.version and self._courses is not None:
+            self._checked_at = time.monotonic()
+            return False
+
+        courses_data = await directus.get_courses()
+        if not courses_data:
+            # Prázdná odpověď je skoro jistě chyba Directusu — neukládáme ji jako
+            # snapshot ani s verzí; při studeném startu zkusí další get() znovu
+            if self._courses is not None:
+                self._checked_at = time.monotonic()
+            return False
+
+        if version is None:
+            digest = hashlib.sha256(json.dumps(courses_data, sort_keys=True, default=str).encode()).hexdigest()
+            version = f"sha:{digest[:16]}"
+
+        self._courses = build_catalog(courses_data)
+        self.version = version
+        self._checked_at = self._loaded_at = time.monotonic()
+        self.reloads += 1
+        return True
+
+    async def invalidate(self) -> Optional[str]:
+        """Zahodí verzi a hned načte katalog znovu (admin endpoint)."""
+        self.version = None
+        self._checked_at = 0.0
+        await self.refresh(force=True)
+        return self.version
+
+    # ── Obnova na pozadí ──────────────────────────────────────────────────────
+
+    def start(self):
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.ensure_future(self._refresh_loop())
+
+    async def stop(self):
+        for task in (self._loop_task, self._background):
+            if task and not task.done():
+                task.cancel()
+        self._loop_task = None
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"❌ Catalog refresh error: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "version": self.version,
+            "courses": len(self._courses or {}),
+            "age_seconds": round(now - self._loaded_at, 1) if self._courses is not None else None,
+            "checks": self.checks,
+            "reloads": self.reloads,
+            "stale_served": self.stale_served,
+        }
+
+course_catalog = CourseCatalog(refresh_interval=settings.CATALOG_REFRESH_SECONDS)
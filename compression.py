@@ -0,0 +1,270 @@
+"""
+Komprese odpovědí podle obsahu a velikosti (náhrada GZipMiddleware).
+
+- komprimuje jen textové typy (HTML, CSS, JS, JSON, SVG, ...) — obrázky,
+  videa (animace Terryho) a už komprimované odpovědi se posílají beze změny
+- kódování podle Accept-Encoding: br > zstd > gzip (br/zstd jen s balíčky
+  `brotli` / `zstandard`)
+- úroveň podle velikosti: malé odpovědi silněji, velké rychleji
+- těla od `thread_threshold` se komprimují ve vlákně, ne v event loopu
+- odpovědi s ETagem se komprimují jednou — další stejné jdou z cache
+- čas CPU strávený kompresí se sčítá po route
+"""
+
+import asyncio
+import gzip
+import time
+import zlib
+from typing import Callable, Dict, Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders
+from assets import accepted_encodings
+from cache import TTLCache
+from call_budget import route_path
+
+try:
+    import brotli  # volitelné
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard  # volitelné
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/xml",
+    "application/xhtml+xml", "application/manifest+json", "application/wasm", "image/svg+xml",
+)
+
+# (do velikosti v bajtech, úroveň) — první vyhovující řádek
+LEVELS = {
+    "br": ((64 * 1024, 5), (1024 * 1024, 4), (float("inf"), 1)),
+    "zstd": ((64 * 1024, 6), (1024 * 1024, 3), (float("inf"), 1)),
+    "gzip": ((64 * 1024, 6), (1024 * 1024, 4), (float("inf"), 1)),
+}
+
+def _gzip(data: bytes, level: int) -> bytes:
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+def _brotli(data: bytes, level: int) -> bytes:
+    return brotli.compress(data, quality=level)
+
+def _zstd(data: bytes, level: int) -> bytes:
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+def available_encodings() -> Dict[str, Callable[[bytes, int], bytes]]:
+    encodings = {}
+    if brotli is not None:
+        encodings["br"] = _brotli
+    if zstandard is not None:
+        encodings["zstd"] = _zstd
+    encodings["gzip"] = _gzip
+    return encodings
+
+def _stream_compressor(encoding: str, level: int):
+    """(compress(chunk), flush()) pro odpovědi posílané po částech."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=level)
+        return compressor.process, compressor.finish
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        return compressor.compress, compressor.flush
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, compressor.flush
+
+def level_for(encoding: str, size: int) -> int:
+    for limit, level in LEVELS[encoding]:
+        if size <= limit:
+            return level
+    return 1
+
+class CompressionStats:
+    def __init__(self):
+        self.routes: Dict[str, Dict] = {}
+        self.encodings: list = []
+        self.cache: Optional[TTLCache] = None
+
+    def add(self, route: str, encoding: Optional[str], size_in: int, size_out: int,
+            cpu: float, cached: bool, threaded: bool):
+        stats = self.routes.setdefault(route, {
+            "responses": 0, "compressed": 0, "cache_hits": 0, "threaded": 0,
+            "bytes_in": 0, "bytes_out": 0, "cpu_ms": 0.0, "encodings": {},
+        })
+        stats["responses"] += 1
+        if encoding is None:
+            return
+        stats["compressed"] += 1
+        stats["cache_hits"] += cached
+        stats["threaded"] += threaded
+        stats["bytes_in"] += size_in
+        stats["bytes_out"] += size_out
+        stats["cpu_ms"] += cpu * 1000
+        stats["encodings"][encoding] = stats["encodings"].get(encoding, 0) + 1
+
+    def summary(self) -> Dict[str, Dict]:
+        result = {}
+        for route, stats in sorted(self.routes.items(), key=lambda item: -item[1]["cpu_ms"]):
+            result[route] = {
+                **stats,
+                "cpu_ms": round(stats["cpu_ms"], 2),
+                "ratio": round(stats["bytes_out"] / stats["bytes_in"], 3) if stats["bytes_in"] else None,
+            }
+        return result
+
+    def stats(self) -> Dict:
+        return {"encodings": self.encodings, "cache": self.cache.stats() if self.cache else None,
+                "routes": self.summary()}
+
+compression_stats = CompressionStats()
+
+class CompressionMiddleware:
+    """ASGI middleware: adaptivní komprese odpovědí (viz docstring modulu)."""
+
+    def __init__(self, app, minimum_size: int = 1000, thread_threshold: int = 64 * 1024,
+                 cache_size: int = 500, cache_ttl: int = 3600):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_threshold = thread_threshold
+        self.encoders = available_encodings()
+        self._cache = TTLCache(default_ttl=cache_ttl, max_size=cache_size)
+        compression_stats.encodings = list(self.encoders)
+        compression_stats.cache = self._cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _Responder(self, scope, send, encoding)
+        await self.app(scope, receive, responder.send)
+
+    def _negotiate(self, header: str) -> Optional[str]:
+        accepted = accepted_encodings(header)
+        wildcard = accepted.get("*", 0.0)
+        best, best_q = None, 0.0
+        for encoding in self.encoders:   # pořadí = preference serveru
+            q = accepted.get(encoding, wildcard)
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+class _Responder:
+    def __init__(self, middleware: CompressionMiddleware, scope, send, encoding: str):
+        self.mw = middleware
+        self.scope = scope
+        self.send_raw = send
+        self.encoding = encoding
+        self.start: Optional[Dict] = None
+        self.passthrough = False
+        self.stream: Optional[Tuple[Callable, Callable]] = None
+        self.size_in = 0
+        self.size_out = 0
+        self.cpu = 0.0
+
+    def _route(self) -> str:
+        return route_path(self.scope.get("app"), self.scope)
+
+    def _compressible(self, headers: Headers) -> bool:
+        if self.start["status"] in (204, 304) or "content-encoding" in headers:
+            return False
+        if "no-transform" in headers.get("cache-control", ""):
+            return False
+        content_type = headers.get("content-type", "").lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _set_headers(self, headers: MutableHeaders, length: Optional[int]):
+        headers["Content-Encoding"] = self.encoding
+        if length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(length)
+        vary = headers.get("vary", "")
+        if "accept-encoding" not in vary.lower():
+            headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+        # Jiné bajty než nekomprimovaná varianta → ETag jen slabý
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+
+    async def send(self, message: Dict):
+        if message["type"] == "http.response.start":
+            self.start = message
+            self.passthrough = not self._compressible(Headers(raw=message["headers"]))
+            if self.passthrough:
+                compression_stats.add(self._route(), None, 0, 0, 0.0, False, False)
+                await self.send_raw(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send_raw(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.stream is None and not more_body:
+            await self._send_whole(body)
+        else:
+            await self._send_chunk(body, more_body)
+
+    async def _send_whole(self, body: bytes):
+        headers = MutableHeaders(raw=self.start["headers"])
+        if len(body) < self.mw.minimum_size:
+            compression_stats.add(self._route(), None, 0, 0, 0.0, False, False)
+            await self.send_raw(self.start)
+            await self.send_raw({"type": "http.response.body", "body": body})
+            return
+
+        level = level_for(self.encoding, len(body))
+        # Stejný ETag = stejné tělo → stačí komprimovat jednou
+        etag = headers.get("etag")
+        cacheable = etag is not None and "no-store" not in headers.get("cache-control", "")
+        key = f"{self.encoding}:{level}:{self.scope['path']}:{etag}:{len(body)}"
+        compressed = self.mw._cache.get(key) if cacheable else None
+        cached = compressed is not None
+        threaded = False
+        cpu = 0.0
+        if compressed is None:
+            encode = self.mw.encoders[self.encoding]
+            if len(body) >= self.mw.thread_threshold:
+                threaded = True
+                compressed, cpu = await asyncio.get_running_loop().run_in_executor(
+                    None, _timed, encode, body, level)
+            else:
+                compressed, cpu = _timed(encode, body, level)
+            if cacheable:
+                self.mw._cache.set(key, compressed)
+
+        compression_stats.add(self._route(), self.encoding, len(body), len(compressed), cpu, cached, threaded)
+        self._set_headers(headers, len(compressed))
+        await self.send_raw(self.start)
+        await self.send_raw({"type": "http.response.body", "body": compressed})
+
+    async def _send_chunk(self, body: bytes, more_body: bool):
+        if self.stream is None:
+            # Odpověď po částech (FileResponse, StreamingResponse). Úroveň podle
+            # Content-Length, když ho odpověď má; jinak délku neznáme → rychlá úroveň
+            headers = MutableHeaders(raw=self.start["headers"])
+            length = headers.get("content-length", "")
+            size = int(length) if length.isdigit() else float("inf")
+            self.stream = _stream_compressor(self.encoding, level_for(self.encoding, size))
+            self._set_headers(headers, None)
+            await self.send_raw(self.start)
+        compress, flush = self.stream
+        started = time.thread_time()
+        out = compress(body) if body else b""
+        if not more_body:
+            out += flush()
+        self.cpu += time.thread_time() - started
+        self.size_in += len(body)
+        self.size_out += len(out)
+        if not more_body:
+            compression_stats.add(self._route(), self.encoding, self.size_in, self.size_out, self.cpu, False, False)
+        await self.send_raw({"type": "http.response.body", "body": out, "more_body": more_body})
+
+def _timed(encode: Callable[[bytes, int], bytes], body: bytes, level: int) -> Tuple[bytes, float]:
+    """Komprese + čas CPU vlákna, ve kterém běžela."""
+    started = time.thread_time()
+    compressed = encode(body, level)
+    return compressed, time.thread_time() - started
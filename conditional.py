@@ -0,0 +1,94 @@
+"""
+Podmíněné GET pro HTML stránky (ETag / If-None-Match → 304).
+
+ETag se skládá jen z věcí, které jdou zjistit bez renderu a bez Directusu:
+verze šablon, uživatel z tokenu, revize jeho pokroku (token v progress_cache,
+mění se s každou změnou pokroku) a verze katalogu kurzů. Když se shoduje
+s If-None-Match, závislost vyhodí NotModified a handler se vůbec nespustí —
+žádné načítání pokroku, render ani komprese.
+
+Zastaralé stránky (pokrok z LKG cache při výpadku Directusu) ETag nedostanou,
+aby je prohlížeč po obnovení Directusu nedržel dál. Stránky s pokrokem
+přihlášeného ETag dostanou jen se sdíleným CACHE_BACKEND (sqlite / redis) —
+s cache v paměti procesu by o změně pokroku věděl jen jeden worker a ostatní
+by dál odpovídali 304 se starým pokrokem.
+"""
+
+import hashlib
+from typing import Optional
+from fastapi import Depends, Request
+from fastapi.responses import Response
+from fastapi.templating import Jinja2Templates
+from catalog import course_catalog
+from request_context import progress_revision, progress_revisions_shared, request_user
+
+# Stránky jsou osobní a musí se pokaždé ověřit — 304 je ale levná
+CACHE_CONTROL = "private, no-cache"
+
+class NotModified(Exception):
+    def __init__(self, etag: str):
+        self.etag = etag
+
+def make_etag(*parts) -> str:
+    return '"' + hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Slabé porovnání podle RFC 9110 (If-None-Match), včetně `*`."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Cookie"})
+
+class ConditionalPages:
+    def __init__(self, templates: Jinja2Templates):
+        self.templates = templates
+        self.checked = 0
+        self.not_modified = 0
+        self.untagged = 0   # stránky s pokrokem bez sdílené revize
+
+    def etag(self, name: str, *, progress: bool = False, catalog: bool = False):
+        """Závislost pro route: spočítá ETag stránky `name`, při shodě vyhodí NotModified.
+
+        Musí být v parametrech handleru před request_student, jinak se pokrok
+        načte dřív, než se o 304 rozhodne.
+        """
+        async def dependency(request: Request, user: Optional[dict] = Depends(request_user)) -> Optional[str]:
+            parts = [name, self.templates.env.template_version.get(), request.url.path]
+            if user:
+                parts += [user.get("id"), user.get("display_name")]
+                if progress:
+                    if not progress_revisions_shared():
+                        self.untagged += 1
+                        return None
+                    parts.append(progress_revision(user.get("id")))
+            if catalog:
+                parts.append(course_catalog.version or "")
+            etag = make_etag(*parts)
+            self.checked += 1
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                self.not_modified += 1
+                raise NotModified(etag)
+            return etag
+        return dependency
+
+    def tag(self, response: Response, etag: Optional[str], stale: bool = False) -> Response:
+        """Přidá ETag k vyrenderované stránce (jen úspěšné a aktuální)."""
+        if etag and response.status_code == 200 and not stale:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = CACHE_CONTROL
+            response.headers["Vary"] = "Cookie"
+        return response
+
+    def stats(self) -> dict:
+        return {
+            "checked": self.checked,
+            "not_modified": self.not_modified,
+            "untagged": self.untagged,
+            "hit_ratio": round(self.not_modified / self.checked, 3) if self.checked else 0.0,
+        }
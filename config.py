@@ -1,4 +1,5 @@
 import os
+import tempfile
 from typing import Optional
 
 class Settings:
@@ -6,6 +7,76 @@ class Settings:
     DIRECTUS_URL: str = os.getenv("DIRECTUS_URL", "http://188.245.190.72:8057")
     DIRECTUS_TOKEN: Optional[str] = os.getenv("DIRECTUS_TOKEN")
 
+    # Sdílený HTTP klient pro Directus (pool spojení, keep-alive)
+    DIRECTUS_TIMEOUT: float = float(os.getenv("DIRECTUS_TIMEOUT", "8.0"))
+    DIRECTUS_MAX_CONNECTIONS: int = int(os.getenv("DIRECTUS_MAX_CONNECTIONS", "50"))
+    DIRECTUS_MAX_KEEPALIVE: int = int(os.getenv("DIRECTUS_MAX_KEEPALIVE", "20"))
+    DIRECTUS_KEEPALIVE_EXPIRY: float = float(os.getenv("DIRECTUS_KEEPALIVE_EXPIRY", "30.0"))
+    DIRECTUS_HTTP2: bool = os.getenv("DIRECTUS_HTTP2", "false").lower() in ("1", "true", "yes")
+
+    # Odolnost: timeout čtení, celkový limit včetně opakování, breaker, hedged čtení (0 = vypnuto)
+    DIRECTUS_READ_TIMEOUT: float = float(os.getenv("DIRECTUS_READ_TIMEOUT", "3.0"))
+    DIRECTUS_READ_DEADLINE: float = float(os.getenv("DIRECTUS_READ_DEADLINE", "5.0"))
+    DIRECTUS_RETRIES: int = int(os.getenv("DIRECTUS_RETRIES", "2"))
+    DIRECTUS_BREAKER_THRESHOLD: int = int(os.getenv("DIRECTUS_BREAKER_THRESHOLD", "5"))
+    DIRECTUS_BREAKER_RESET: float = float(os.getenv("DIRECTUS_BREAKER_RESET", "30"))
+    DIRECTUS_HEDGE_AFTER: float = float(os.getenv("DIRECTUS_HEDGE_AFTER", "0"))
+
+    # Rozpočet volání Directusu na jeden požadavek (varování v logu) a práh pro N+1
+    DIRECTUS_CALL_BUDGET: int = int(os.getenv("DIRECTUS_CALL_BUDGET", "4"))
+    DIRECTUS_N1_THRESHOLD: int = int(os.getenv("DIRECTUS_N1_THRESHOLD", "2"))
+
+    # Katalog kurzů (snapshot v paměti, obnova na pozadí)
+    CATALOG_REFRESH_SECONDS: int = int(os.getenv("CATALOG_REFRESH_SECONDS", "300"))
+
+    # Cache (memory | sqlite | redis); CACHE_URL = cesta k souboru nebo redis:// URL
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory").lower()
+    CACHE_URL: str = os.getenv("CACHE_URL", os.path.join(tempfile.gettempdir(), "ngc_cache.sqlite3"))
+
+    # Sandbox pro spouštění studentského kódu (/run_code)
+    SANDBOX_POOL_SIZE: int = int(os.getenv("SANDBOX_POOL_SIZE", "4"))          # předem spuštěné workery
+    SANDBOX_MAX_CONCURRENT: int = int(os.getenv("SANDBOX_MAX_CONCURRENT", "8"))  # souběžné běhy
+    SANDBOX_MAX_QUEUE: int = int(os.getenv("SANDBOX_MAX_QUEUE", "32"))          # čekající ve frontě
+    SANDBOX_PER_USER: int = int(os.getenv("SANDBOX_PER_USER", "1"))            # souběžné běhy na přihlášeného uživatele
+    SANDBOX_TIMEOUT: float = float(os.getenv("SANDBOX_TIMEOUT", "5"))
+    SANDBOX_CPU_SECONDS: int = int(os.getenv("SANDBOX_CPU_SECONDS", "5"))
+    SANDBOX_MEMORY_MB: int = int(os.getenv("SANDBOX_MEMORY_MB", "256"))
+    SANDBOX_MAX_OUTPUT: int = int(os.getenv("SANDBOX_MAX_OUTPUT", "64000"))    # znaků výstupu
+    TURTLE_MAX_STEPS: int = int(os.getenv("TURTLE_MAX_STEPS", "200000"))       # řádků kódu na běh
+    TURTLE_MAX_COMMANDS: int = int(os.getenv("TURTLE_MAX_COMMANDS", "50000"))  # příkazů želvy na běh
+
+    # Cache výsledků deterministických programů (klíč = hash normalizovaného AST)
+    RUN_CACHE_SIZE: int = int(os.getenv("RUN_CACHE_SIZE", "1000"))
+    RUN_CACHE_TTL: int = int(os.getenv("RUN_CACHE_TTL", "3600"))
+
+    # Zápis pokroku na pozadí (dávky do Directusu + žurnál proti ztrátě při pádu)
+    PROGRESS_FLUSH_INTERVAL: float = float(os.getenv("PROGRESS_FLUSH_INTERVAL", "1.0"))
+    PROGRESS_BATCH_SIZE: int = int(os.getenv("PROGRESS_BATCH_SIZE", "50"))
+    PROGRESS_JOURNAL: str = os.getenv("PROGRESS_JOURNAL", os.path.join(tempfile.gettempdir(), "ngc_progress.jsonl"))
+
+    # Čtení pokroku: latence, po které se místo čekání vrátí poslední známý stav, a jak dlouho ho držet
+    PROGRESS_LATENCY_BUDGET: float = float(os.getenv("PROGRESS_LATENCY_BUDGET", "1.5"))
+    PROGRESS_LKG_TTL: int = int(os.getenv("PROGRESS_LKG_TTL", "86400"))
+
+    # Šablony: bytecode cache (předvyplní ji precompile_templates.py), zahřátí při startu,
+    # kontrola změn souborů při každém renderu (v produkci lze vypnout)
+    TEMPLATE_CACHE_DIR: str = os.getenv("TEMPLATE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".template_cache"))
+    TEMPLATE_WARMUP: bool = os.getenv("TEMPLATE_WARMUP", "true").lower() in ("1", "true", "yes")
+    TEMPLATE_AUTO_RELOAD: bool = os.getenv("TEMPLATE_AUTO_RELOAD", "true").lower() in ("1", "true", "yes")
+
+    # Cache hotového HTML: celé stránky pro nepřihlášené a sdílené fragmenty ({% cache %})
+    PAGE_CACHE_SIZE: int = int(os.getenv("PAGE_CACHE_SIZE", "500"))
+    PAGE_CACHE_TTL: int = int(os.getenv("PAGE_CACHE_TTL", "300"))
+    FRAGMENT_CACHE_SIZE: int = int(os.getenv("FRAGMENT_CACHE_SIZE", "2000"))
+
+    # Komprese odpovědí: minimální velikost, od jaké velikosti komprimovat ve vlákně, cache podle ETagu
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1000"))
+    COMPRESSION_THREAD_THRESHOLD: int = int(os.getenv("COMPRESSION_THREAD_THRESHOLD", "65536"))
+    COMPRESSION_CACHE_SIZE: int = int(os.getenv("COMPRESSION_CACHE_SIZE", "500"))
+
+    # Token pro admin endpointy (/api/admin/...); bez něj jsou vypnuté
+    ADMIN_TOKEN: Optional[str] = os.getenv("ADMIN_TOKEN")
+
     # Veřejná URL aplikace (pro OAuth callback)
     APP_URL: str = os.getenv("APP_URL", "https://pythonprojekt-ten.vercel.app")
 
@@ -17,6 +88,11 @@ class Settings:
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))  # 24h
+    # Implementace JWT: jose | pyjwt | hmac (viz jwt_backend.py)
+    JWT_BACKEND: str = os.getenv("JWT_BACKEND", "jose").lower()
+    # Cache ověřených tokenů (položka žije nejvýš do exp tokenu)
+    JWT_CACHE_SIZE: int = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+    JWT_CACHE_TTL: int = int(os.getenv("JWT_CACHE_TTL", "300"))
 
     # Aplikace
     APP_TITLE: str = "NextGen Coders"
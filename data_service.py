@@ -1,7 +1,14 @@
+import asyncio
 from typing import Dict, List, Optional
 from directus_client import directus
+from catalog import course_catalog
+from progress_writer import progress_writer
 from schemas import StudentProgress
 
+# Pole, která z Directusu opravdu potřebujeme pro StudentProgress
+PROGRESS_FIELDS = "lesson,completed,completion_percentage"
+USER_NAME_FIELDS = "first_name,email"
+
 class DataService:
 
     # ── Auth ──────────────────────────────────────────────────────────────────
@@ -33,33 +40,21 @@ class DataService:
     # ── Kurzy ─────────────────────────────────────────────────────────────────
 
     async def get_courses(self) -> Dict[str, Dict]:
-        courses_data = await directus.get_courses()
-        return {
-            course["course_id"]: {
-                "id": course["id"],
-                "title": course["title"],
-                "description": course["description"],
-                "level": course["level"],
-                "lessons": [
-                    {
-                        "id": lesson["id"],
-                        "title": lesson["title"],
-                        "description": lesson["description"],
-                        "lesson_number": lesson["lesson_number"]
-                    }
-                    for lesson in course.get("lessons", [])
-                ]
-            }
-            for course in courses_data
-        }
+        """Katalog kurzů ze snapshotu v paměti (viz catalog.CourseCatalog)."""
+        return await course_catalog.get()
 
     # ── Pokrok ────────────────────────────────────────────────────────────────
 
     async def get_user_progress(self, user_id: str) -> StudentProgress:
-        progress_data = await directus.get_user_progress(user_id)
+        # Pokrok i jméno jsou nezávislé — oba dotazy běží souběžně a vrací jen potřebná pole
+        progress_data, user_info = await asyncio.gather(
+            directus.get_user_progress(user_id, fields=PROGRESS_FIELDS),
+            directus.get_user_by_id(user_id, fields=USER_NAME_FIELDS),
+        )
+        # Změny, které ještě čekají na zápis do Directusu
+        progress_data = progress_writer.merge(user_id, progress_data)
         completed_lessons = [p["lesson"] for p in progress_data if p.get("completed")]
 
-        user_info = await self.get_user_info_by_id(user_id)
         display_name = ""
         if user_info:
             display_name = user_info.get("first_name") or user_info.get("email", "Student").split("@")[0]
@@ -70,8 +65,25 @@ class DataService:
             current_level="Úvod"
         )
 
+    def with_pending(self, progress: StudentProgress, user_id: str) -> StudentProgress:
+        """Doplní do (zastaralého) pokroku lekce, které čekají na zápis do Directusu."""
+        pending = [r["lesson"] for r in progress_writer.pending_for(user_id) if r["completed"]]
+        if not pending:
+            return progress
+        lessons = list(progress.completed_lessons)
+        lessons += [int(l) for l in pending if l.isdigit() and int(l) not in lessons]
+        return progress.model_copy(update={"completed_lessons": lessons})
+
     async def update_user_progress(self, user_id: str, lesson_id: str, completed: bool = True) -> bool:
-        result = await directus.update_user_progress(user_id, lesson_id, completed)
-        return result is not None
+        """Zařadí zápis do fronty (viz progress_writer) a hned se vrátí.
+
+        True = zapsáno do žurnálu a čeká na zápis do Directusu (ještě nepotvrzeno).
+        """
+        try:
+            await progress_writer.enqueue(user_id, lesson_id, completed)
+            return True
+        except OSError as e:
+            print(f"❌ Progress journal error: {e}")
+            return False
 
 data_service = DataService()
@@ -1,6 +1,104 @@
+import json
+import time
 import httpx
-from typing import Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Union
 from config import settings
+from singleflight import SingleFlight
+from call_budget import record_call
+from resilience import CircuitBreaker, DirectusError, Resilience
+
+try:
+    import ijson  # volitelné: inkrementální parsování velkých odpovědí
+except ImportError:
+    ijson = None
+
+def _http2_available() -> bool:
+    """HTTP/2 vyžaduje volitelný balíček `h2` (pip install httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class Query:
+    """Parametry dotazu na /items: projekce polí, filtr, řazení, stránkování a deep.
+
+        Query(fields=["id", "title", "lessons.title"],
+              filter={"status": {"_eq": "published"}},
+              sort=["sort"], limit=-1,
+              deep={"lessons": {"_sort": ["lesson_number"]}})
+
+    `fields` bere seznam i řetězec "a,b,c"; `limit=-1` znamená všechny položky.
+    """
+
+    def __init__(self, fields: Union[str, Sequence[str], None] = None, filter: Optional[Dict] = None,
+                 sort: Union[str, Sequence[str], None] = None, limit: Optional[int] = None,
+                 offset: Optional[int] = None, deep: Optional[Dict] = None):
+        self.fields = fields.split(",") if isinstance(fields, str) else list(fields or [])
+        self.filter = filter
+        self.sort = sort.split(",") if isinstance(sort, str) else list(sort or [])
+        self.limit = limit
+        self.offset = offset
+        self.deep = deep
+
+    def page(self, limit: int, offset: int = 0) -> "Query":
+        """Kopie dotazu pro jednu stránku výsledků."""
+        return Query(self.fields, self.filter, self.sort, limit, offset, self.deep)
+
+    def params(self) -> Dict[str, str]:
+        params: Dict[str, Any] = {}
+        if self.fields:
+            params["fields"] = ",".join(self.fields)
+        if self.filter:
+            params["filter"] = json.dumps(self.filter, separators=(",", ":"))
+        if self.sort:
+            params["sort"] = ",".join(self.sort)
+        if self.limit is not None:
+            params["limit"] = str(self.limit)
+        if self.offset:
+            params["offset"] = str(self.offset)
+        if self.deep:
+            params["deep"] = json.dumps(self.deep, separators=(",", ":"))
+        return params
+
+# Co opravdu vykreslují šablony — bez `content` lekcí a dalších velkých polí
+COURSE_FIELDS = [
+    "id", "course_id", "title", "description", "level",
+    "lessons.id", "lessons.title", "lessons.description", "lessons.lesson_number",
+]
+
+class _AsyncByteReader:
+    """Obal proudu httpx s metodou read() pro ijson.items_async."""
+
+    def __init__(self, response: httpx.Response):
+        self._chunks = response.aiter_bytes()
+        self._buffer = b""
+
+    async def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += await self._chunks.__anext__()
+            except StopAsyncIteration:
+                break
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+# Timeouty podle endpointu (s); ostatní čtení DIRECTUS_READ_TIMEOUT, zápisy DIRECTUS_TIMEOUT
+ENDPOINT_TIMEOUTS = {
+    "revisions": 2.0,
+    "users": 3.0,
+    "items/user_progress": 3.0,
+    "items/courses": 5.0,
+    "auth": 8.0,
+}
+
+def _endpoint(path: str) -> str:
+    """/items/user_progress/12?x=1 -> "items/user_progress", /users/me -> "users"."""
+    parts = path.split("?", 1)[0].strip("/").split("/")
+    return "/".join(parts[:2]) if parts[0] == "items" else parts[0]
 
 class DirectusClient:
     def __init__(self):
@@ -10,20 +108,185 @@ class DirectusClient:
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.token}"
         } if self.token else {"Content-Type": "application/json"}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._http2 = False
+        self._requests_sent = 0
+        self._clients_created = 0
+        self._reads = SingleFlight()
+        self.resilience = Resilience(
+            read_timeout=settings.DIRECTUS_READ_TIMEOUT,
+            write_timeout=settings.DIRECTUS_TIMEOUT,
+            read_deadline=settings.DIRECTUS_READ_DEADLINE,
+            retries=settings.DIRECTUS_RETRIES,
+            breaker=CircuitBreaker(settings.DIRECTUS_BREAKER_THRESHOLD, settings.DIRECTUS_BREAKER_RESET),
+            hedge_after=settings.DIRECTUS_HEDGE_AFTER,
+            timeouts=ENDPOINT_TIMEOUTS,
+        )
+
+    # ── Sdílený HTTP klient ───────────────────────────────────────────────────
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Vrátí dlouho žijící klienta s poolem spojení (vytvoří ho líně)."""
+        if self._client is None or self._client.is_closed:
+            http2 = settings.DIRECTUS_HTTP2 and _http2_available()
+            if settings.DIRECTUS_HTTP2 and not http2:
+                print("⚠️ DIRECTUS_HTTP2 zapnuto, ale chybí balíček h2 — používám HTTP/1.1")
+            self._http2 = http2
+            self._client = httpx.AsyncClient(
+                timeout=settings.DIRECTUS_TIMEOUT,
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=settings.DIRECTUS_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.DIRECTUS_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.DIRECTUS_KEEPALIVE_EXPIRY,
+                ),
+                event_hooks={"request": [self._on_request]},
+            )
+            self._clients_created += 1
+        return self._client
+
+    async def _on_request(self, request: httpx.Request):
+        self._requests_sent += 1
+
+    async def aclose(self):
+        """Zavře pool spojení (volá se při vypnutí aplikace)."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    def pool_stats(self) -> Dict:
+        """Statistiky poolu pro monitoring (/api/health)."""
+        stats = {
+            "open": self._client is not None and not self._client.is_closed,
+            "http2": self._http2,
+            "max_connections": settings.DIRECTUS_MAX_CONNECTIONS,
+            "max_keepalive": settings.DIRECTUS_MAX_KEEPALIVE,
+            "requests_sent": self._requests_sent,
+            "clients_created": self._clients_created,
+        }
+        # httpx nevystavuje pool veřejně — čteme z httpcore, pokud je k dispozici
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        stats["connections"] = len(connections)
+        stats["idle_connections"] = sum(1 for c in connections if c.is_idle())
+        return stats
+
+    async def _coalesced_get(self, url: str, headers: Optional[Dict] = None) -> httpx.Response:
+        """GET, kde se souběžné identické dotazy (URL + token) sloučí do jednoho."""
+        headers = headers if headers is not None else self._admin_headers
+        key = (url, headers.get("Authorization"))
+        return await self._reads.do(key, lambda: self._request("GET", url, headers=headers))
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """HTTP volání přes vrstvu odolnosti (timeout endpointu, opakování čtení, breaker).
+
+        Při výpadku vyhodí DirectusError / DirectusUnavailable; 4xx vrací normálně.
+        """
+        endpoint = _endpoint(url[len(self.base_url):])
+
+        async def send(timeout: float) -> httpx.Response:
+            started = time.perf_counter()
+            nbytes = 0
+            try:
+                response = await self._get_client().request(method, url, timeout=timeout, **kwargs)
+                nbytes = len(response.content)
+                return response
+            finally:
+                # Počítá se každý pokus (i opakování a hedge) do rozpočtu požadavku
+                record_call(endpoint, nbytes, time.perf_counter() - started)
+
+        if method == "GET":
+            return await self.resilience.read(endpoint, send)
+        return await self.resilience.write(endpoint, send)
+
+    def coalescing_stats(self) -> Dict:
+        """Kolik čtení bylo sloučeno s již běžícím dotazem."""
+        return self._reads.stats()
+
+    # ── Dotazy na kolekce ─────────────────────────────────────────────────────
+
+    def items_url(self, collection: str, query: Optional[Query] = None, item_id: Optional[str] = None) -> str:
+        path = f"{self.base_url}/items/{collection}" + (f"/{item_id}" if item_id is not None else "")
+        return str(httpx.URL(path, params=query.params() if query else None))
+
+    async def get_items(self, collection: str, query: Optional[Query] = None,
+                        headers: Optional[Dict] = None) -> List[Dict]:
+        """Jedna stránka položek kolekce podle `query`. Chyby propaguje (raise_for_status)."""
+        response = await self._coalesced_get(self.items_url(collection, query), headers=headers)
+        response.raise_for_status()
+        return response.json().get("data", [])
+
+    async def iter_items(self, collection: str, query: Optional[Query] = None,
+                         page_size: int = 100, headers: Optional[Dict] = None) -> AsyncIterator[Dict]:
+        """Projde celou kolekci po stránkách (limit/offset) — bez načtení všeho do paměti."""
+        query = query or Query()
+        offset = query.offset or 0
+        while True:
+            page = await self.get_items(collection, query.page(page_size, offset), headers=headers)
+            for item in page:
+                yield item
+            if len(page) < page_size:
+                return
+            offset += page_size
+
+    async def stream_items(self, collection: str, query: Optional[Query] = None, page_size: int = 500,
+                           key: str = "id", headers: Optional[Dict] = None) -> AsyncIterator[Dict]:
+        """Projde (i obří) kolekci v konstantní paměti — pro exporty a analytiku.
+
+        Stránkuje podle klíče (`key > poslední`), takže každá stránka je stejně
+        levná jako první, a řádky parsuje průběžně z proudu odpovědi (s ijson),
+        jinak po jedné stránce. Pořadí je vždy podle `key`.
+        """
+        query = query or Query()
+        fields = list(query.fields)
+        if fields and key not in fields:
+            fields.append(key)
+        last = None
+        while True:
+            filter = query.filter
+            if last is not None:
+                after = {key: {"_gt": last}}
+                filter = {"_and": [query.filter, after]} if query.filter else after
+            url = self.items_url(collection, Query(fields, filter, [key], page_size, None, query.deep))
+            count = 0
+            async for item in self._stream_page(url, headers if headers is not None else self._admin_headers):
+                count += 1
+                last = item[key]
+                yield item
+            if count < page_size:
+                return
+
+    async def _stream_page(self, url: str, headers: Dict) -> AsyncIterator[Dict]:
+        endpoint = _endpoint(url[len(self.base_url):])
+        with self.resilience.guard(endpoint):
+            started = time.perf_counter()
+            async with self._get_client().stream("GET", url, headers=headers) as response:
+                try:
+                    if response.status_code >= 500:
+                        raise DirectusError(f"{endpoint}: HTTP {response.status_code}")
+                    response.raise_for_status()
+                    if ijson is not None:
+                        async for item in ijson.items_async(_AsyncByteReader(response), "data.item", use_float=True):
+                            yield item
+                    else:
+                        body = await response.aread()
+                        for item in json.loads(body).get("data", []):
+                            yield item
+                finally:
+                    record_call(endpoint, response.num_bytes_downloaded, time.perf_counter() - started)
 
     # ── Auth ──────────────────────────────────────────────────────────────────
 
     async def authenticate(self, email: str, password: str) -> Optional[Dict]:
         """Přihlášení emailem+heslem přes Directus /auth/login."""
         try:
-            async with httpx.AsyncClient(timeout=8.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/auth/login",
-                    json={"email": email, "password": password}
-                )
-                if response.status_code == 200:
-                    return response.json()   # {"data": {"access_token": ..., "refresh_token": ...}}
-                return None
+            response = await self._request(
+                "POST", f"{self.base_url}/auth/login",
+                json={"email": email, "password": password}
+            )
+            if response.status_code == 200:
+                return response.json()   # {"data": {"access_token": ..., "refresh_token": ...}}
+            return None
         except Exception as e:
             print(f"❌ Auth error: {e}")
             return None
@@ -34,17 +297,16 @@ class DirectusClient:
         if nickname:
             data["first_name"] = nickname
         try:
-            async with httpx.AsyncClient(timeout=8.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/users",
-                    json=data,
-                    headers=self._admin_headers
-                )
-                print(f"📊 Create user status: {response.status_code}")
-                if response.status_code in [200, 201]:
-                    return response.json().get("data")
-                print(f"❌ Create user failed: {response.text}")
-                return None
+            response = await self._request(
+                "POST", f"{self.base_url}/users",
+                json=data,
+                headers=self._admin_headers
+            )
+            print(f"📊 Create user status: {response.status_code}")
+            if response.status_code in [200, 201]:
+                return response.json().get("data")
+            print(f"❌ Create user failed: {response.text}")
+            return None
         except Exception as e:
             print(f"❌ Create user exception: {e}")
             return None
@@ -52,29 +314,27 @@ class DirectusClient:
     async def get_user_info_by_token(self, directus_token: str) -> Optional[Dict]:
         """Vrátí info o přihlášeném uživateli z /users/me."""
         try:
-            async with httpx.AsyncClient(timeout=8.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/users/me",
-                    headers={"Authorization": f"Bearer {directus_token}"}
-                )
-                if response.status_code == 200:
-                    return response.json().get("data")
-                return None
+            response = await self._coalesced_get(
+                f"{self.base_url}/users/me",
+                headers={"Authorization": f"Bearer {directus_token}"}
+            )
+            if response.status_code == 200:
+                return response.json().get("data")
+            return None
         except Exception as e:
             print(f"❌ Get user me error: {e}")
             return None
 
-    async def get_user_by_id(self, user_id: str) -> Optional[Dict]:
-        """Vrátí uživatele podle ID (admin token)."""
+    async def get_user_by_id(self, user_id: str, fields: Optional[str] = None) -> Optional[Dict]:
+        """Vrátí uživatele podle ID (admin token). `fields` omezí vrácená pole."""
         try:
-            async with httpx.AsyncClient(timeout=8.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/users/{user_id}",
-                    headers=self._admin_headers
-                )
-                if response.status_code == 200:
-                    return response.json().get("data")
-                return None
+            url = f"{self.base_url}/users/{user_id}"
+            if fields:
+                url += f"?fields={fields}"
+            response = await self._coalesced_get(url, headers=self._admin_headers)
+            if response.status_code == 200:
+                return response.json().get("data")
+            return None
         except Exception:
             return None
 
@@ -82,93 +342,169 @@ class DirectusClient:
 
     async def get_courses(self) -> List[Dict]:
         try:
-            async with httpx.AsyncClient(timeout=8.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/items/courses?filter[status][_eq]=published&sort=sort",
-                    headers=self._admin_headers
-                )
-                response.raise_for_status()
-                return response.json().get("data", [])
+            return await self.get_items("courses", Query(
+                fields=COURSE_FIELDS,
+                filter={"status": {"_eq": "published"}},
+                sort=["sort"],
+                limit=-1,
+                deep={"lessons": {"_sort": ["lesson_number"], "_limit": -1}},
+            ))
         except Exception:
             return []
 
+    async def get_content_version(self, collections: List[str]) -> Optional[str]:
+        """Levně zjistí verzi obsahu kolekcí (ETag nebo ID poslední revize).
+
+        Vrátí None, pokud verzi zjistit nelze (např. chybí práva na /revisions).
+        """
+        try:
+            response = await self._coalesced_get(
+                f"{self.base_url}/revisions?filter[collection][_in]={','.join(collections)}"
+                f"&sort=-id&limit=1&fields=id",
+                headers=self._admin_headers
+            )
+            response.raise_for_status()
+            etag = response.headers.get("ETag")
+            if etag:
+                return etag
+            data = response.json().get("data", [])
+            return f"rev:{data[0]['id']}" if data else "rev:0"
+        except Exception:
+            return None
+
     async def get_course(self, course_id: str) -> Optional[Dict]:
         try:
-            async with httpx.AsyncClient(timeout=8.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/items/courses/{course_id}",
-                    headers=self._admin_headers
-                )
-                response.raise_for_status()
-                return response.json().get("data")
+            response = await self._coalesced_get(
+                self.items_url("courses", Query(fields=COURSE_FIELDS), item_id=course_id),
+                headers=self._admin_headers
+            )
+            response.raise_for_status()
+            return response.json().get("data")
         except Exception:
             return None
 
     # ── Pokrok uživatele ──────────────────────────────────────────────────────
 
-    async def get_user_progress(self, user_id: str) -> List[Dict]:
+    async def get_user_progress(self, user_id: str, fields: Union[str, Sequence[str], None] = None) -> List[Dict]:
+        """Záznamy pokroku uživatele. Při chybě vyhodí DirectusError — prázdný
+        seznam tak vždy znamená "zatím nic nesplnil", ne výpadek."""
         try:
-            async with httpx.AsyncClient(timeout=8.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/items/user_progress?filter[user][_eq]={user_id}",
-                    headers=self._admin_headers
-                )
-                response.raise_for_status()
-                return response.json().get("data", [])
-        except Exception:
-            return []
+            return await self.get_items("user_progress", Query(
+                fields=fields,
+                filter={"user": {"_eq": user_id}},
+                limit=-1,
+            ))
+        except DirectusError:
+            raise
+        except Exception as e:
+            raise DirectusError(f"user_progress: {e}") from e
 
     async def update_user_progress(self, user_id: str, lesson_id: str,
                                    completed: bool = True,
                                    completion_percentage: float = 100.0,
                                    time_spent: int = 0) -> Optional[Dict]:
         try:
-            async with httpx.AsyncClient(timeout=8.0) as client:
-                existing = await client.get(
-                    f"{self.base_url}/items/user_progress?filter[user][_eq]={user_id}&filter[lesson][_eq]={lesson_id}",
+            existing = await self._request(
+                "GET", self.items_url("user_progress", Query(
+                    fields=["id"],
+                    filter={"user": {"_eq": user_id}, "lesson": {"_eq": lesson_id}},
+                    limit=1,
+                )),
+                headers=self._admin_headers
+            )
+            existing_data = existing.json().get("data", [])
+
+            if existing_data:
+                progress_id = existing_data[0]["id"]
+                r = await self._request(
+                    "PATCH", f"{self.base_url}/items/user_progress/{progress_id}",
+                    json={"completed": completed, "completion_percentage": completion_percentage, "time_spent": time_spent},
                     headers=self._admin_headers
                 )
-                existing_data = existing.json().get("data", [])
-
-                if existing_data:
-                    progress_id = existing_data[0]["id"]
-                    r = await client.patch(
-                        f"{self.base_url}/items/user_progress/{progress_id}",
-                        json={"completed": completed, "completion_percentage": completion_percentage, "time_spent": time_spent},
-                        headers=self._admin_headers
-                    )
-                else:
-                    r = await client.post(
-                        f"{self.base_url}/items/user_progress",
-                        json={"user": user_id, "lesson": lesson_id, "completed": completed,
-                              "completion_percentage": completion_percentage, "time_spent": time_spent},
-                        headers=self._admin_headers
-                    )
-                return r.json().get("data")
+            else:
+                r = await self._request(
+                    "POST", f"{self.base_url}/items/user_progress",
+                    json={"user": user_id, "lesson": lesson_id, "completed": completed,
+                          "completion_percentage": completion_percentage, "time_spent": time_spent},
+                    headers=self._admin_headers
+                )
+            return r.json().get("data")
         except Exception:
             return None
 
+    async def upsert_user_progress(self, records: List[Dict]) -> bool:
+        """Hromadný upsert záznamů pokroku (klíč = user + lesson).
+
+        Jeden GET najde existující záznamy, pak jeden hromadný PATCH a jeden
+        hromadný POST. Opakované volání se stejnými daty nic nezdvojí.
+
+        Vrátí False, když Directus dávku odmítl (4xx — např. neexistující
+        lekce); při výpadku (síť, 5xx, 401/403, otevřený breaker) vyhodí
+        DirectusError.
+        """
+        if not records:
+            return True
+        try:
+            existing = await self._request(
+                "GET", self.items_url("user_progress", Query(
+                    fields=["id", "user", "lesson"],
+                    filter={"user": {"_in": sorted({str(r["user"]) for r in records})},
+                            "lesson": {"_in": sorted({str(r["lesson"]) for r in records})}},
+                    limit=-1,
+                )),
+                headers=self._admin_headers
+            )
+            existing.raise_for_status()
+            ids = {(str(item["user"]), str(item["lesson"])): item["id"]
+                   for item in existing.json().get("data", [])}
+
+            updates, creates = [], []
+            for r in records:
+                fields = {"completed": r["completed"], "completion_percentage": r["completion_percentage"],
+                          "time_spent": r["time_spent"]}
+                progress_id = ids.get((str(r["user"]), str(r["lesson"])))
+                if progress_id is not None:
+                    updates.append({"id": progress_id, **fields})
+                else:
+                    creates.append({"user": r["user"], "lesson": r["lesson"], **fields})
+
+            if updates:
+                r = await self._request("PATCH", f"{self.base_url}/items/user_progress",
+                                        json=updates, headers=self._admin_headers)
+                r.raise_for_status()
+            if creates:
+                r = await self._request("POST", f"{self.base_url}/items/user_progress",
+                                        json=creates, headers=self._admin_headers)
+                r.raise_for_status()
+            return True
+        except DirectusError:
+            raise
+        except httpx.HTTPStatusError as e:
+            # 401/403 = chybný admin token, ne vadný záznam — jako výpadek
+            if e.response.status_code >= 500 or e.response.status_code in (401, 403):
+                raise DirectusError(f"user_progress: HTTP {e.response.status_code}") from e
+            print(f"❌ upsert_user_progress rejected: HTTP {e.response.status_code} {e.response.text[:200]}")
+            return False
+        except Exception as e:
+            raise DirectusError(f"user_progress: {e}") from e
+
     # ── Achievementy ──────────────────────────────────────────────────────────
 
     async def get_achievements(self) -> List[Dict]:
         try:
-            async with httpx.AsyncClient(timeout=8.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/items/achievements?filter[status][_eq]=published",
-                    headers=self._admin_headers
-                )
-                return response.json().get("data", [])
+            return await self.get_items("achievements", Query(
+                filter={"status": {"_eq": "published"}},
+                limit=-1,
+            ))
         except Exception:
             return []
 
     async def get_user_achievements(self, user_id: str) -> List[Dict]:
         try:
-            async with httpx.AsyncClient(timeout=8.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/items/user_achievements?filter[user][_eq]={user_id}",
-                    headers=self._admin_headers
-                )
-                return response.json().get("data", [])
+            return await self.get_items("user_achievements", Query(
+                filter={"user": {"_eq": user_id}},
+                limit=-1,
+            ))
         except Exception:
             return []
 
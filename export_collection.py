@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Export kolekce z Directusu do JSONL nebo CSV v konstantní paměti.
+
+Řádky se čtou proudově přes DirectusClient.stream_items (stránkování podle
+klíče, průběžné parsování s ijson, pokud je nainstalovaný) a hned se
+zapisují do souboru — i user_progress se statisíci řádků.
+
+    python export_collection.py user_progress --fields user,lesson,completed -o progress.jsonl
+    python export_collection.py user_progress --format csv -o progress.csv
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+from directus_client import directus, Query
+
+def _peak_memory_mb() -> float:
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+async def export(collection: str, fields: list, output, fmt: str, page_size: int, filter: dict) -> int:
+    writer = None
+    count = 0
+    async for row in directus.stream_items(collection, Query(fields=fields, filter=filter), page_size=page_size):
+        if fmt == "csv":
+            if writer is None:
+                writer = csv.DictWriter(output, fieldnames=list(row.keys()), extrasaction="ignore")
+                writer.writeheader()
+            writer.writerow({k: json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v
+                             for k, v in row.items()})
+        else:
+            output.write(json.dumps(row, ensure_ascii=False) + "\n")
+        count += 1
+        if count % 10_000 == 0:
+            print(f"  ... {count} řádků", file=sys.stderr)
+    return count
+
+async def main():
+    parser = argparse.ArgumentParser(description="Export kolekce z Directusu (JSONL/CSV)")
+    parser.add_argument("collection")
+    parser.add_argument("--fields", default="", help="čárkou oddělená pole (výchozí: všechna)")
+    parser.add_argument("--filter", default="", help='Directus filtr jako JSON, např. {"completed":{"_eq":true}}')
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("-o", "--output", default="-", help="výstupní soubor (výchozí: stdout)")
+    args = parser.parse_args()
+
+    fields = [f for f in args.fields.split(",") if f]
+    filter = json.loads(args.filter) if args.filter else None
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    started = time.perf_counter()
+    try:
+        count = await export(args.collection, fields, output, args.format, args.page_size, filter)
+    except Exception as e:
+        print(f"❌ Export selhal: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        await directus.aclose()
+    print(f"✅ {count} řádků z '{args.collection}' za {time.perf_counter() - started:.1f} s "
+          f"(špička paměti {_peak_memory_mb():.0f} MB)", file=sys.stderr)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+"""
+Kódování a ověřování JWT (HS256) přes vyměnitelnou implementaci.
+
+- `jose` — python-jose (původní, výchozí)
+- `pyjwt` — PyJWT (vyžaduje: pip install pyjwt); podle bench_jwt.py o něco
+  pomalejší než jose, hodí se, když už je PyJWT v projektu
+- `hmac` — vlastní minimální kodek jen pro HS256/384/512 ze standardní knihovny
+
+Všechny vydávají i přijímají stejné tokeny (stejné claims, `exp` jako unix
+timestamp), takže jde backend přepnout bez odhlášení uživatelů.
+"""
+
+import base64
+import calendar
+import hashlib
+import hmac
+import json
+import time
+from datetime import datetime
+from typing import Dict, Iterable
+from config import settings
+
+class InvalidToken(Exception):
+    """Token je poškozený, má špatný podpis nebo vypršel."""
+
+# Časové claims, které se z datetime převádějí na unix timestamp
+TIME_CLAIMS = ("exp", "iat", "nbf")
+
+def _timestamps(claims: Dict) -> Dict:
+    claims = dict(claims)
+    for name in TIME_CLAIMS:
+        value = claims.get(name)
+        if isinstance(value, datetime):
+            claims[name] = calendar.timegm(value.utctimetuple())
+    return claims
+
+class JWTBackend:
+    name = ""
+
+    def encode(self, claims: Dict, key: str, algorithm: str) -> str:
+        raise NotImplementedError
+
+    def decode(self, token: str, key: str, algorithms: Iterable[str]) -> Dict:
+        """Vrátí claims, jinak vyhodí InvalidToken."""
+        raise NotImplementedError
+
+class JoseBackend(JWTBackend):
+    name = "jose"
+
+    def __init__(self):
+        from jose import JWTError, jwt
+        self._jwt = jwt
+        self._error = JWTError
+
+    def encode(self, claims: Dict, key: str, algorithm: str) -> str:
+        return self._jwt.encode(_timestamps(claims), key, algorithm=algorithm)
+
+    def decode(self, token: str, key: str, algorithms: Iterable[str]) -> Dict:
+        try:
+            return self._jwt.decode(token, key, algorithms=list(algorithms))
+        except self._error as e:
+            raise InvalidToken(str(e)) from e
+
+class PyJWTBackend(JWTBackend):
+    name = "pyjwt"
+
+    def __init__(self):
+        import jwt  # volitelná závislost
+        self._jwt = jwt
+
+    def encode(self, claims: Dict, key: str, algorithm: str) -> str:
+        return self._jwt.encode(_timestamps(claims), key, algorithm=algorithm)
+
+    def decode(self, token: str, key: str, algorithms: Iterable[str]) -> Dict:
+        try:
+            return self._jwt.decode(token, key, algorithms=list(algorithms))
+        except self._jwt.PyJWTError as e:
+            raise InvalidToken(str(e)) from e
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+class HMACBackend(JWTBackend):
+    """Minimální JWS kompaktní serializace s HMAC-SHA2. Ověřuje podpis, `alg`, `exp` a `nbf`."""
+
+    name = "hmac"
+    DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+    def __init__(self):
+        # Hlavička je pro daný algoritmus pořád stejná — zakódujeme ji jednou
+        self._headers = {
+            alg: _b64encode(json.dumps({"alg": alg, "typ": "JWT"}, separators=(",", ":")).encode())
+            for alg in self.DIGESTS
+        }
+
+    def encode(self, claims: Dict, key: str, algorithm: str) -> str:
+        digest = self.DIGESTS.get(algorithm)
+        if digest is None:
+            raise ValueError(f"Nepodporovaný algoritmus: {algorithm}")
+        payload = _b64encode(json.dumps(_timestamps(claims), separators=(",", ":")).encode())
+        signing_input = self._headers[algorithm] + b"." + payload
+        signature = _b64encode(hmac.new(key.encode(), signing_input, digest).digest())
+        return (signing_input + b"." + signature).decode("ascii")
+
+    def decode(self, token: str, key: str, algorithms: Iterable[str]) -> Dict:
+        try:
+            raw = token.encode("ascii")
+            signing_input, _, signature = raw.rpartition(b".")
+            header_b64, _, payload_b64 = signing_input.partition(b".")
+            header = json.loads(_b64decode(header_b64))
+            algorithm = header.get("alg")
+            # alg z hlavičky musí být mezi povolenými (jinak útok záměnou algoritmu)
+            if algorithm not in algorithms or algorithm not in self.DIGESTS:
+                raise InvalidToken(f"Nepovolený algoritmus: {algorithm}")
+            expected = hmac.new(key.encode(), signing_input, self.DIGESTS[algorithm]).digest()
+            if not hmac.compare_digest(expected, _b64decode(signature)):
+                raise InvalidToken("Neplatný podpis")
+            claims = json.loads(_b64decode(payload_b64))
+        except InvalidToken:
+            raise
+        except (ValueError, TypeError, AttributeError, UnicodeError) as e:
+            raise InvalidToken(f"Poškozený token: {e}") from e
+        if not isinstance(claims, dict):
+            raise InvalidToken("Claims nejsou objekt")
+        now = time.time()
+        if "exp" in claims:
+            if not isinstance(claims["exp"], (int, float)):
+                raise InvalidToken("Neplatný exp")
+            if claims["exp"] <= now:
+                raise InvalidToken("Token vypršel")
+        if "nbf" in claims:
+            if not isinstance(claims["nbf"], (int, float)):
+                raise InvalidToken("Neplatný nbf")
+            if claims["nbf"] > now:
+                raise InvalidToken("Token ještě neplatí")
+        return claims
+
+BACKENDS = {"jose": JoseBackend, "pyjwt": PyJWTBackend, "hmac": HMACBackend}
+
+def make_backend(name: str = None) -> JWTBackend:
+    """Vytvoří backend podle JWT_BACKEND. Když nejde načíst, použije vestavěný `hmac`."""
+    name = (name or settings.JWT_BACKEND).lower()
+    try:
+        return BACKENDS[name]()
+    except (KeyError, ImportError) as e:
+        print(f"⚠️ JWT backend '{name}' nelze použít ({e!r}) — používám hmac")
+    return HMACBackend()
+
+# Sdílená instance
+jwt_backend = make_backend()
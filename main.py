@@ -1,32 +1,77 @@
-from fastapi import FastAPI, Request, Form, HTTPException, status
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from fastapi.middleware.gzip import GZipMiddleware
+from fastapi import FastAPI, Request, Form, Header, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from config import settings
 from data_service import data_service
-from auth_directus import create_access_token, get_current_user_optional
+from directus_client import directus
+from catalog import course_catalog
+from sandbox import sandbox, SandboxBusy
+from run_cache import run_cache
+from progress_writer import progress_writer
+from auth_directus import create_access_token, get_current_user_optional, forget_token, token_cache_stats
 from schemas import UserCreate, StudentProgress
-from cache import progress_cache
+from cache import progress_cache, progress_lkg_cache
+from request_context import request_user, request_student, bump_progress_revision, sandbox_user_key
+from call_budget import CallBudgetMiddleware, route_stats
+from compression import CompressionMiddleware, compression_stats
+from templating import make_templates, warm_up, PageCache
+from assets import AssetManifest, PrecompressedStaticFiles
+from conditional import ConditionalPages, NotModified, not_modified_response
 from api.courses import router as courses_router
+from typing import Optional
 import uvicorn
-import subprocess
-import tempfile
-import os
+import asyncio
 import hashlib
+import hmac
 import httpx
 
 app = FastAPI(title=settings.APP_TITLE, description=settings.APP_DESCRIPTION)
 
+@app.on_event("startup")
+async def startup():
+    # Katalog kurzů se načte a dál obnovuje na pozadí
+    course_catalog.start()
+    # Předem nastartované workery pro /run_code
+    await sandbox.start()
+    # Zápis pokroku na pozadí (obnoví i nezapsané záznamy z žurnálu)
+    progress_writer.start()
+    # Všechny šablony do paměti hned — první požadavek už nic nekompiluje
+    if settings.TEMPLATE_WARMUP:
+        report = app.state.template_warmup = warm_up(templates)
+        print(f"✅ Šablony: {report['templates']} načteno za {report['total_ms']} ms "
+              f"(z bytecode cache {report['bytecode_cache']['hits']})")
+
+@app.on_event("shutdown")
+async def shutdown():
+    await course_catalog.stop()
+    await sandbox.stop()
+    await progress_writer.stop()
+    # Korektně zavře sdílený pool spojení na Directus
+    await directus.aclose()
+
 # Middleware
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE,
+                   thread_threshold=settings.COMPRESSION_THREAD_THRESHOLD,
+                   cache_size=settings.COMPRESSION_CACHE_SIZE)
+app.add_middleware(CallBudgetMiddleware, max_calls=settings.DIRECTUS_CALL_BUDGET,
+                   max_same_endpoint=settings.DIRECTUS_N1_THRESHOLD)
 
 # Routery
 app.include_router(courses_router)
 
 # Statické soubory + šablony
-app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+# /static/dist/ = otisknuté soubory z build_assets.py (immutable, předkomprimované .br/.gz)
+static_files = PrecompressedStaticFiles(directory="static")
+app.mount("/static", static_files, name="static")
+asset_manifest = AssetManifest("static")
+templates = make_templates("templates", assets=asset_manifest)
+# Hotové HTML pro nepřihlášené (a sdílené fragmenty přes {% cache %})
+pages = PageCache(templates, ttl=settings.PAGE_CACHE_TTL, max_size=settings.PAGE_CACHE_SIZE)
+# ETag / 304 pro stránky — rozhodne se před načtením pokroku i renderem
+etags = ConditionalPages(templates)
+
+@app.exception_handler(NotModified)
+async def not_modified(request: Request, exc: NotModified):
+    return not_modified_response(exc.etag)
 
 
 # ── Pomocné funkce ────────────────────────────────────────────────────────────
@@ -49,26 +94,12 @@ def _google_auth_url() -> str:
     }
     return f"{GOOGLE_AUTH_URL}?{urllib.parse.urlencode(params)}"
 
-async def get_student_progress(user_id: str = None) -> StudentProgress:
-    """Pro nepřihlášené vrátí prázdný progress ihned (bez volání Directus)."""
-    if not user_id:
-        return StudentProgress(name="Host", completed_lessons=[], current_level="Úvod")
-
-    cached = progress_cache.get(f"progress:{user_id}")
-    if cached:
-        return cached
-
-    progress = await data_service.get_user_progress(user_id)
-    progress_cache.set(f"progress:{user_id}", progress, ttl=60)
-    return progress
-
-
 # ── Stránky ───────────────────────────────────────────────────────────────────
 
 @app.get("/", response_class=HTMLResponse)
-async def dashboard(request: Request):
-    current_user = await get_current_user_optional(request)
-    student = await get_student_progress(current_user.get("id") if current_user else None)
+async def dashboard(request: Request, current_user: Optional[dict] = Depends(request_user),
+                    etag: Optional[str] = Depends(etags.etag("dashboard.html", progress=True)),
+                    student: StudentProgress = Depends(request_student)):
 
     available_courses = [
         {
@@ -143,23 +174,24 @@ async def dashboard(request: Request):
         },
     ]
 
-    return templates.TemplateResponse("dashboard.html", {
+    response = pages.render(request, "dashboard.html", {
         "request": request,
         "courses": available_courses,
         "student": student,
         "user": current_user
     })
+    return etags.tag(response, etag, student.stale)
 
 @app.get("/python", response_class=HTMLResponse)
-async def python_course(request: Request):
-    current_user = await get_current_user_optional(request)
-    student = await get_student_progress(current_user.get("id") if current_user else None)
+async def python_course(request: Request, current_user: Optional[dict] = Depends(request_user),
+                        etag: Optional[str] = Depends(etags.etag("python_dashboard.html", progress=True)),
+                        student: StudentProgress = Depends(request_student)):
 
     total_lessons = 4
     completed_lessons = len(student.completed_lessons)
     progress_percent = int((completed_lessons / total_lessons) * 100) if total_lessons > 0 else 0
 
-    return templates.TemplateResponse("python_dashboard.html", {
+    response = templates.TemplateResponse("python_dashboard.html", {
         "request": request,
         "student": student,
         "user": current_user,
@@ -167,111 +199,122 @@ async def python_course(request: Request):
         "completed_lessons": completed_lessons,
         "progress_percent": progress_percent
     })
+    return etags.tag(response, etag, student.stale)
 
 @app.get("/predlekce/python", response_class=HTMLResponse)
-async def python_intro(request: Request):
-    current_user = await get_current_user_optional(request)
-    student = await get_student_progress(current_user.get("id") if current_user else None)
-    return templates.TemplateResponse("predlekce.html", {
+async def python_intro(request: Request, current_user: Optional[dict] = Depends(request_user),
+                       etag: Optional[str] = Depends(etags.etag("predlekce.html", progress=True)),
+                       student: StudentProgress = Depends(request_student)):
+    response = templates.TemplateResponse("predlekce.html", {
         "request": request, "student": student, "user": current_user
     })
+    return etags.tag(response, etag, student.stale)
 
 @app.get("/python-course/lesson-1", response_class=HTMLResponse)
-async def python_lesson_1(request: Request):
-    current_user = await get_current_user_optional(request)
-    student = await get_student_progress(current_user.get("id") if current_user else None)
-    return templates.TemplateResponse("python_lesson_1.html", {
+async def python_lesson_1(request: Request, current_user: Optional[dict] = Depends(request_user),
+                          etag: Optional[str] = Depends(etags.etag("python_lesson_1.html", progress=True)),
+                          student: StudentProgress = Depends(request_student)):
+    response = templates.TemplateResponse("python_lesson_1.html", {
         "request": request, "student": student, "user": current_user
     })
+    return etags.tag(response, etag, student.stale)
 
 @app.get("/python-course/lesson-2", response_class=HTMLResponse)
-async def python_lesson_2(request: Request):
-    current_user = await get_current_user_optional(request)
-    student = await get_student_progress(current_user.get("id") if current_user else None)
-    return templates.TemplateResponse("python_lesson_2.html", {
+async def python_lesson_2(request: Request, current_user: Optional[dict] = Depends(request_user),
+                          etag: Optional[str] = Depends(etags.etag("python_lesson_2.html", progress=True)),
+                          student: StudentProgress = Depends(request_student)):
+    response = templates.TemplateResponse("python_lesson_2.html", {
         "request": request, "student": student, "user": current_user
     })
+    return etags.tag(response, etag, student.stale)
 
 @app.get("/python-course/lesson-3", response_class=HTMLResponse)
-async def python_lesson_3(request: Request):
-    current_user = await get_current_user_optional(request)
-    student = await get_student_progress(current_user.get("id") if current_user else None)
-    return templates.TemplateResponse("python_lesson_3.html", {
+async def python_lesson_3(request: Request, current_user: Optional[dict] = Depends(request_user),
+                          etag: Optional[str] = Depends(etags.etag("python_lesson_3.html", progress=True)),
+                          student: StudentProgress = Depends(request_student)):
+    response = templates.TemplateResponse("python_lesson_3.html", {
         "request": request, "student": student, "user": current_user
     })
+    return etags.tag(response, etag, student.stale)
 
 @app.get("/playground", response_class=HTMLResponse)
-async def playground(request: Request):
-    current_user = await get_current_user_optional(request)
-    return templates.TemplateResponse("playground.html", {
+async def playground(request: Request, current_user: Optional[dict] = Depends(request_user),
+                     etag: str = Depends(etags.etag("playground.html"))):
+    response = pages.render(request, "playground.html", {
         "request": request,
         "student": StudentProgress(name="Host", completed_lessons=[], current_level="Úvod"),
         "user": current_user
     })
+    return etags.tag(response, etag)
 
 @app.get("/profil", response_class=HTMLResponse)
-async def profile(request: Request):
-    current_user = await get_current_user_optional(request)
-    student = await get_student_progress(current_user.get("id") if current_user else None)
+async def profile(request: Request, current_user: Optional[dict] = Depends(request_user),
+                  student: StudentProgress = Depends(request_student)):
     return templates.TemplateResponse("profil.html", {
         "request": request, "student": student, "user": current_user
     })
 
 @app.get("/kurz/javascript", response_class=HTMLResponse)
-async def javascript_course(request: Request):
-    current_user = await get_current_user_optional(request)
-    return templates.TemplateResponse("coming_soon.html", {
+async def javascript_course(request: Request, current_user: Optional[dict] = Depends(request_user),
+                            etag: str = Depends(etags.etag("coming_soon.html"))):
+    response = pages.render(request, "coming_soon.html", {
         "request": request, "user": current_user,
         "course_title": "JavaScript", "course_emoji": "🌐",
         "course_color": "#f59e0b",
         "topics": ["Proměnné a funkce", "Manipulace s webem (DOM)", "Animace a efekty", "Jednoduché hry v prohlížeči"],
     })
+    return etags.tag(response, etag)
 
 @app.get("/kurz/vibe-coding", response_class=HTMLResponse)
-async def vibe_coding_course(request: Request):
-    current_user = await get_current_user_optional(request)
-    return templates.TemplateResponse("coming_soon.html", {
+async def vibe_coding_course(request: Request, current_user: Optional[dict] = Depends(request_user),
+                             etag: str = Depends(etags.etag("coming_soon.html"))):
+    response = pages.render(request, "coming_soon.html", {
         "request": request, "user": current_user,
         "course_title": "Vibe Coding", "course_emoji": "🤖",
         "course_color": "#06b6d4",
         "topics": ["Jak funguje AI asistent", "Prompt engineering pro programátory", "Tvorba aplikací s AI pomocníkem", "Projekty: web, hra, chatbot"],
     })
+    return etags.tag(response, etag)
 
 @app.get("/kurz/kybernetika", response_class=HTMLResponse)
-async def kybernetika_course(request: Request):
-    current_user = await get_current_user_optional(request)
-    return templates.TemplateResponse("coming_soon.html", {
+async def kybernetika_course(request: Request, current_user: Optional[dict] = Depends(request_user),
+                             etag: str = Depends(etags.etag("coming_soon.html"))):
+    response = pages.render(request, "coming_soon.html", {
         "request": request, "user": current_user,
         "course_title": "Kybernetická bezpečnost", "course_emoji": "🔐",
         "course_color": "#ef4444",
         "topics": ["Silná hesla a správce hesel", "Phishing a podvodné zprávy", "Soukromí na sociálních sítích", "Bezpečné chování online"],
     })
+    return etags.tag(response, etag)
 
 @app.get("/kurz/pc-life-balance", response_class=HTMLResponse)
-async def pc_life_balance_course(request: Request):
-    current_user = await get_current_user_optional(request)
-    return templates.TemplateResponse("coming_soon.html", {
+async def pc_life_balance_course(request: Request, current_user: Optional[dict] = Depends(request_user),
+                                 etag: str = Depends(etags.etag("coming_soon.html"))):
+    response = pages.render(request, "coming_soon.html", {
         "request": request, "user": current_user,
         "course_title": "PC-Life Balance", "course_emoji": "⚖️",
         "course_color": "#8b5cf6",
         "topics": ["Zdravý obrazovkový čas", "Digitální detox a přestávky", "Sociální sítě bez závislosti", "Technologie jako nástroj, ne pán"],
     })
+    return etags.tag(response, etag)
 
 @app.get("/kurz/{course_id}", response_class=HTMLResponse)
-async def course_page(request: Request, course_id: str):
-    current_user = await get_current_user_optional(request)
+async def course_page(request: Request, course_id: str, current_user: Optional[dict] = Depends(request_user),
+                      etag: Optional[str] = Depends(etags.etag("kurz.html", progress=True, catalog=True)),
+                      student: StudentProgress = Depends(request_student)):
     courses = await data_service.get_courses()
     if course_id not in courses:
         return templates.TemplateResponse("dashboard.html", {
             "request": request, "courses": courses,
-            "student": await get_student_progress(),
+            "student": student,
             "user": current_user, "error": "Kurz nenalezen"
         })
-    return templates.TemplateResponse("kurz.html", {
+    response = templates.TemplateResponse("kurz.html", {
         "request": request, "course": courses[course_id],
-        "course_id": course_id, "student": await get_student_progress(),
+        "course_id": course_id, "student": student,
         "user": current_user
     })
+    return etags.tag(response, etag, student.stale)
 
 
 # ── Přihlášení / Registrace ───────────────────────────────────────────────────
@@ -367,7 +410,8 @@ async def register(user_data: UserCreate):
         )
 
 @app.post("/logout")
-async def logout():
+async def logout(request: Request):
+    forget_token(request.cookies.get("access_token"))
     response = RedirectResponse(url="/", status_code=status.HTTP_302_FOUND)
     response.delete_cookie(key="access_token")
     return response
@@ -456,41 +500,114 @@ async def auth_callback(request: Request, code: str = None, error: str = None):
 # ── API ───────────────────────────────────────────────────────────────────────
 
 @app.post("/run_code")
-async def run_code(code: str = Form(...)):
+async def run_code(request: Request, code: str = Form(...), current_user: Optional[dict] = Depends(request_user)):
+    user_key = sandbox_user_key(current_user)
     try:
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, encoding='utf-8') as f:
-            f.write('# -*- coding: utf-8 -*-\n')
-            f.write(code)
-            temp_file = f.name
-
-        result = subprocess.run(
-            ['python', temp_file],
-            capture_output=True, text=True,
-            timeout=5, encoding='utf-8', errors='replace'
-        )
-        os.unlink(temp_file)
-        return {"output": result.stdout, "error": result.stderr, "return_code": result.returncode}
-    except subprocess.TimeoutExpired:
-        return {"error": "Kód běžel příliš dlouho (max 5 sekund)"}
+        return await run_cache.run(code, user_key=user_key)
+    except SandboxBusy as e:
+        return {"error": str(e)}
     except Exception as e:
         return {"error": f"Chyba: {str(e)}"}
 
+@app.websocket("/ws/run")
+async def run_code_stream(websocket: WebSocket):
+    """Spuštění kódu s průběžným výstupem.
+
+    Klient posílá {"action": "run", "code": ..., "mode": "python"|"turtle"}
+    nebo {"action": "cancel"}, server posílá události ze sandbox.stream()
+    (stdout/stderr/turtle/error/exit). Po odpojení klienta se program hned ukončí.
+    """
+    await websocket.accept()
+    current_user = await get_current_user_optional(websocket)
+    user_key = sandbox_user_key(current_user)
+    running = None
+
+    async def pump(code: str, mode: str):
+        try:
+            async for event in run_cache.stream(code, user_key=user_key, mode=mode):
+                await websocket.send_json(event)
+        except SandboxBusy as e:
+            await websocket.send_json({"type": "error", "error": str(e)})
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            await websocket.send_json({"type": "error", "error": f"Chyba: {str(e)}"})
+
+    async def cancel_running():
+        if running is not None and not running.done():
+            running.cancel()
+            try:
+                await running
+            except asyncio.CancelledError:
+                pass
+            return True
+        return False
+
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                await websocket.send_json({"type": "error", "error": "Neplatná zpráva"})
+                continue
+            action = message.get("action") if isinstance(message, dict) else None
+            if action == "run":
+                if running is not None and not running.done():
+                    await websocket.send_json({"type": "error", "error": "Už ti běží jiný program — počkej, až doběhne."})
+                    continue
+                mode = "turtle" if message.get("mode") == "turtle" else "python"
+                running = asyncio.ensure_future(pump(str(message.get("code", "")), mode))
+            elif action == "cancel":
+                if await cancel_running():
+                    await websocket.send_json({"type": "cancelled"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Klient odešel — uvolníme worker hned, ne až po timeoutu
+        await cancel_running()
+
 @app.post("/update_progress")
-async def update_progress(request: Request, lesson_id: int = Form(...)):
-    current_user = await get_current_user_optional(request)
+async def update_progress(request: Request, lesson_id: int = Form(...),
+                          current_user: Optional[dict] = Depends(request_user)):
     if not current_user:
         return {"success": False, "error": "Nejsi přihlášen(a)"}
 
+    # Neexistující lekci by Directus odmítl — do fronty ji vůbec nepustíme
+    if lesson_id <= 0 or await course_catalog.has_lesson(lesson_id) is False:
+        return JSONResponse({"success": False, "error": "Lekce nenalezena"}, status_code=404)
+
     user_id = current_user.get("id")
+    if not await data_service.update_user_progress(user_id, str(lesson_id), True):
+        return JSONResponse({"success": False, "error": "Pokrok se nepodařilo uložit"}, status_code=503)
     # Invalidace cache po aktualizaci pokroku
     progress_cache.delete(f"progress:{user_id}")
+    # Nová revize → stránky s pokrokem dostanou nový ETag
+    bump_progress_revision(user_id)
+    # Zařazeno, do Directusu se zapíše na pozadí — potvrzené to ještě není
+    return JSONResponse({"queued": True}, status_code=202)
+
+@app.post("/api/admin/catalog/invalidate")
+async def invalidate_catalog(x_admin_token: str = Header(None)):
+    """Vynutí okamžité znovunačtení katalogu kurzů (po úpravě obsahu v Directusu)."""
+    _require_admin(x_admin_token)
+    version = await course_catalog.invalidate()
+    return {"success": True, "version": version, "catalog": course_catalog.stats()}
+
+@app.get("/api/admin/directus-calls")
+async def directus_calls(x_admin_token: str = Header(None)):
+    """Volání Directusu po route (počet, bajty, čas, překročení rozpočtu, N+1)."""
+    _require_admin(x_admin_token)
+    return {
+        "budget": {"max_calls": settings.DIRECTUS_CALL_BUDGET, "max_same_endpoint": settings.DIRECTUS_N1_THRESHOLD},
+        "routes": route_stats.summary(),
+    }
 
-    success = await data_service.update_user_progress(user_id, str(lesson_id), True)
-    return {"success": success}
+def _require_admin(token: str):
+    if not settings.ADMIN_TOKEN or not token or not hmac.compare_digest(token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Přístup odepřen")
 
 @app.get("/api/health")
 async def health_check():
-    import httpx
     health_status = {
         "app": "ok",
         "directus": {
@@ -501,26 +618,44 @@ async def health_check():
         }
     }
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
+        client = directus._get_client()
+        try:
+            r = await client.get(f"{settings.DIRECTUS_URL}/server/ping", timeout=5.0)
+            health_status["directus"]["reachable"] = r.status_code == 200
+        except Exception as e:
+            health_status["directus"]["error"] = str(e)
+
+        if settings.DIRECTUS_TOKEN:
             try:
-                r = await client.get(f"{settings.DIRECTUS_URL}/server/ping")
-                health_status["directus"]["reachable"] = r.status_code == 200
+                headers = {"Authorization": f"Bearer {settings.DIRECTUS_TOKEN}"}
+                r = await client.get(f"{settings.DIRECTUS_URL}/collections", headers=headers, timeout=5.0)
+                health_status["directus"]["authenticated"] = r.status_code == 200
+                if r.status_code == 200:
+                    health_status["directus"]["collections"] = [
+                        c["collection"] for c in r.json().get("data", [])
+                    ]
             except Exception as e:
-                health_status["directus"]["error"] = str(e)
-
-            if settings.DIRECTUS_TOKEN:
-                try:
-                    headers = {"Authorization": f"Bearer {settings.DIRECTUS_TOKEN}"}
-                    r = await client.get(f"{settings.DIRECTUS_URL}/collections", headers=headers)
-                    health_status["directus"]["authenticated"] = r.status_code == 200
-                    if r.status_code == 200:
-                        health_status["directus"]["collections"] = [
-                            c["collection"] for c in r.json().get("data", [])
-                        ]
-                except Exception as e:
-                    health_status["directus"]["auth_error"] = str(e)
+                health_status["directus"]["auth_error"] = str(e)
     except Exception as e:
         health_status["error"] = str(e)
+    health_status["directus"]["pool"] = directus.pool_stats()
+    health_status["directus"]["coalescing"] = directus.coalescing_stats()
+    health_status["directus"]["resilience"] = directus.resilience.stats()
+    health_status["catalog"] = course_catalog.stats()
+    health_status["cache"] = {"progress": progress_cache.stats(), "progress_lkg": progress_lkg_cache.stats(),
+                              "tokens": token_cache_stats()}
+    health_status["progress_writer"] = progress_writer.stats()
+    health_status["sandbox"] = sandbox.stats()
+    health_status["run_cache"] = run_cache.stats()
+    health_status["templates"] = {
+        "bytecode_cache": templates.env.bytecode_cache.stats(),
+        "warmup": getattr(app.state, "template_warmup", None),
+        "render_cache": pages.stats(),
+        "conditional": etags.stats(),
+    }
+    health_status["compression"] = compression_stats.stats()
+    health_status["assets"] = {"manifest_entries": len(asset_manifest),
+                               "precompressed_hits": static_files.precompressed_hits}
     return health_status
 
 
@@ -1,7 +1,7 @@
 from fastapi import FastAPI, Request, Form, Depends, HTTPException, status
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from assets import AssetManifest, PrecompressedStaticFiles
+from templating import make_templates
 from config import settings
 from data_service import data_service
 from auth import create_access_token, get_current_user_optional
@@ -15,10 +15,10 @@ from datetime import datetime, timedelta
 app = FastAPI(title=settings.APP_TITLE, description=settings.APP_DESCRIPTION)
 
 # Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 
 # Templates
-templates = Jinja2Templates(directory="templates")
+templates = make_templates("templates", assets=AssetManifest("static"))
 
 # Inicializace databáze při startu (pouze pro offline režim)
 @app.on_event("startup")
@@ -164,10 +164,11 @@ async def update_progress(lesson_id: int = Form(...)):
     # Prozatím použijeme placeholder
     user_id = "1"  # TODO: Získat z autentifikace
     
-    success = await data_service.update_user_progress(user_id, str(lesson_id), True)
+    queued = await data_service.update_user_progress(user_id, str(lesson_id), True)
     
-    if success:
-        return {"success": True}
+    if queued:
+        # Zapíše se do Directusu na pozadí (progress_writer) — zatím jen zařazeno
+        return JSONResponse({"queued": True}, status_code=202)
     else:
         return {"success": False, "error": "Chyba při aktualizaci pokroku"}
 
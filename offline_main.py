@@ -1,7 +1,7 @@
 from fastapi import FastAPI, Request, Form, Depends, HTTPException, status
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from assets import AssetManifest, PrecompressedStaticFiles
+from templating import make_templates
 from sqlalchemy.orm import Session
 from database import get_db, init_database, User, Course, Lesson, UserProgress, Achievement, UserAchievement
 from auth import authenticate_user, create_access_token, get_current_user_optional, create_user
@@ -16,10 +16,10 @@ import json
 app = FastAPI(title="Python Kurz - Offline Verze", description="Výuková platforma pro Python (offline)")
 
 # Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 
 # Templates
-templates = Jinja2Templates(directory="templates")
+templates = make_templates("templates", assets=AssetManifest("static"))
 
 # Offline verze - jeden "host" uživatel pro celou rodinu
 OFFLINE_USER = {
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Předkompilace šablon do bytecode cache (krok buildu / deploye).
+
+Zkompiluje všechny šablony z templates/ a uloží bytecode do
+TEMPLATE_CACHE_DIR, odkud ho workery při startu jen načtou.
+
+    python precompile_templates.py [--clear]
+"""
+
+import argparse
+import sys
+from templating import make_templates, warm_up
+
+def main():
+    parser = argparse.ArgumentParser(description="Předkompilace Jinja2 šablon do bytecode cache")
+    parser.add_argument("--clear", action="store_true", help="nejdřív smazat starou cache")
+    parser.add_argument("--directory", default="templates")
+    args = parser.parse_args()
+
+    templates = make_templates(args.directory)
+    cache = templates.env.bytecode_cache
+    if args.clear:
+        cache.clear()
+
+    report = warm_up(templates)
+    for name, error in report.get("errors", {}).items():
+        print(f"❌ {name}: {error}", file=sys.stderr)
+    stats = cache.stats()
+    print(f"✅ {report['templates']} šablon za {report['total_ms']} ms → {stats['directory']} "
+          f"(zapsáno {stats['dumps']}, už v cache {stats['hits']})")
+    if stats["write_errors"]:
+        print(f"⚠️ {stats['write_errors']} šablon se nepodařilo zapsat", file=sys.stderr)
+
+    # Pro srovnání: nový worker s hotovou cache (jen načtení bytecode)
+    warm = warm_up(make_templates(args.directory))
+    print(f"   nový worker s hotovou cache: {warm['total_ms']} ms")
+    sys.exit(1 if report.get("errors") or stats["write_errors"] else 0)
+
+if __name__ == "__main__":
+    main()
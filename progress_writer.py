@@ -0,0 +1,360 @@
+"""
+Zápis pokroku na pozadí (write-behind) s lokálním žurnálem.
+
+/update_progress jen zapíše záznam do žurnálu a do fronty v paměti a hned
+odpoví. Fronta drží pro každé (user, lesson) jen poslední stav, takže dvojklik
+nic nezdvojí, a na Directus se posílá hromadně — po `flush_interval`
+sekundách nebo hned, když fronta dosáhne `batch_size`.
+
+Žurnál je JSONL soubor: řádek {"put": {...}} při zařazení, {"ack": id}
+po úspěšném zápisu a {"dead": {...}} pro záznam, který Directus odmítl.
+Každý worker má vlastní žurnál (`<PROGRESS_JOURNAL>.<pid>`) a po celou dobu
+běhu drží flock na jeho `.lock` souboru (ten se nikdy nepřepisuje). Při startu
+worker převezme žurnály, jejichž zámek nikdo nedrží (jejich proces spadl),
+a znovu zařadí všechno, co nemá ack; upsert v Directusu je idempotentní,
+takže opakovaný zápis nevadí.
+
+Když Directus dávku odmítne, zapisuje se po jednom a záznamy, které neprojdou
+ani samostatně, jdou do dead-letter seznamu — jeden vadný záznam tak
+nezablokuje zápis ostatních. Při výpadku Directusu se další pokus odkládá
+(exponenciálně, s rozptylem).
+"""
+
+import asyncio
+import glob
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+from config import settings
+from directus_client import directus
+from resilience import DirectusError
+
+try:
+    import fcntl
+except ImportError:  # Windows — žurnál pak sdílí jen jeden proces
+    fcntl = None
+
+# Kolik odmítnutých záznamů držet v paměti pro /api/health
+DEAD_LETTERS_KEPT = 100
+
+class ProgressWriter:
+    def __init__(self, journal_path: str, flush_interval: float = 1.0, batch_size: int = 50,
+                 compact_after: int = 1000, backoff_max: float = 60.0):
+        self.journal_base = journal_path
+        self.journal_path = journal_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.compact_after = compact_after
+        self.backoff_max = backoff_max
+        self._pending: Dict[Tuple[str, str], Dict] = {}
+        self._superseded: List[str] = []   # id záznamů přepsaných novějším stavem
+        self._lock = threading.Lock()
+        self._journal_lock = threading.Lock()   # zápis vs. kompakce v rámci procesu
+        self._owner_fd: Optional[int] = None    # flock na <žurnál>.lock po celou dobu běhu
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Lock] = None
+        self._journal_lines = 0
+        self._retry_at = 0.0
+        self._outages = 0   # neúspěšné pokusy za sebou (pro backoff)
+        self.dead_letters: List[Dict] = []
+        self.enqueued = 0
+        self.deduplicated = 0
+        self.flushes = 0
+        self.written = 0
+        self.failures = 0
+        self.dead = 0
+        self.recovered = 0
+        self.adopted = 0
+
+    # ── Žurnál ────────────────────────────────────────────────────────────────
+
+    def _open_journal(self):
+        """Vybere žurnál tohoto procesu a zamkne ho (zámek drží až do konce běhu)."""
+        if fcntl is None or self._owner_fd is not None:
+            return
+        self.journal_path = f"{self.journal_base}.{os.getpid()}"
+        self._owner_fd = os.open(self.journal_path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._owner_fd, fcntl.LOCK_EX)
+
+    def _append(self, entries: List[Dict]):
+        data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries).encode("utf-8")
+        with self._journal_lock:
+            fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, data)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self._journal_lines += len(entries)
+
+    async def _append_async(self, entries: List[Dict]):
+        # fsync trvá na pomalém disku i desítky ms — ne v event loopu
+        await asyncio.get_running_loop().run_in_executor(None, self._append, entries)
+
+    @staticmethod
+    def _read_unacked(path: str) -> Dict[str, Dict]:
+        records: Dict[str, Dict] = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # useknutý poslední řádek po pádu
+                    if "put" in entry:
+                        records[entry["put"]["id"]] = entry["put"]
+                    elif "ack" in entry:
+                        records.pop(entry["ack"], None)
+                    elif "dead" in entry:
+                        records.pop(entry["dead"]["id"], None)
+        except FileNotFoundError:
+            pass
+        return records
+
+    def _compact(self):
+        """Přepíše žurnál jen na záznamy bez ack (atomicky přes os.replace).
+
+        Do žurnálu zapisuje jen tento proces, takže stačí zámek v procesu —
+        cizí proces na soubor nesáhne, dokud držíme jeho .lock.
+        """
+        with self._journal_lock:
+            records = self._read_unacked(self.journal_path)
+            tmp_path = f"{self.journal_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in records.values():
+                    f.write(json.dumps({"put": record}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.journal_path)
+            self._journal_lines = len(records)
+
+    def _adopt_orphans(self) -> List[Dict]:
+        """Převezme žurnály spadlých workerů: jejich záznamy přepíše do vlastního žurnálu."""
+        if fcntl is None:
+            return []
+        records: List[Dict] = []
+        for lock_path in glob.glob(glob.escape(self.journal_base) + ".*.lock"):
+            path = lock_path[:-len(".lock")]
+            if path == self.journal_path:
+                continue
+            try:
+                fd = os.open(lock_path, os.O_RDWR)
+            except FileNotFoundError:
+                continue  # mezitím převzal jiný worker
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # proces žije
+                orphan = list(self._read_unacked(path).values())
+                if orphan:
+                    self._append([{"put": record} for record in orphan])
+                # Nejdřív smazat žurnál, pak zámek — kdo přijde po nás, nic nenajde
+                for stale in (path, lock_path):
+                    try:
+                        os.unlink(stale)
+                    except FileNotFoundError:
+                        pass
+                records += orphan
+                self.adopted += len(orphan)
+            finally:
+                os.close(fd)
+        return records
+
+    def recover(self):
+        """Znovu zařadí záznamy, které se před pádem nestihly zapsat."""
+        self._open_journal()
+        records = list(self._read_unacked(self.journal_path).values()) + self._adopt_orphans()
+        self._journal_lines = len(records)
+        with self._lock:
+            for record in sorted(records, key=lambda r: r["ts"]):
+                key = (record["user"], record["lesson"])
+                if key in self._pending:
+                    self._superseded.append(self._pending[key]["id"])
+                else:
+                    self.recovered += 1
+                self._pending[key] = record
+
+    # ── Fronta ────────────────────────────────────────────────────────────────
+
+    async def enqueue(self, user_id: str, lesson_id: str, completed: bool = True,
+                      completion_percentage: float = 100.0, time_spent: int = 0):
+        """Zařadí zápis pokroku. Vrací se po zápisu do žurnálu; na Directus se zapíše na pozadí."""
+        record = {
+            "id": uuid.uuid4().hex, "ts": time.time(),
+            "user": str(user_id), "lesson": str(lesson_id), "completed": completed,
+            "completion_percentage": completion_percentage, "time_spent": time_spent,
+        }
+        await self._append_async([{"put": record}])
+        with self._lock:
+            key = (record["user"], record["lesson"])
+            if key in self._pending:
+                self._superseded.append(self._pending[key]["id"])
+                self.deduplicated += 1
+            self._pending[key] = record
+            self.enqueued += 1
+            full = len(self._pending) >= self.batch_size
+        if full and self._wakeup is not None:
+            self._wakeup.set()
+
+    def pending_for(self, user_id: str) -> List[Dict]:
+        """Nezapsané (i právě zapisované) záznamy uživatele — pro čtení pokroku."""
+        user_id = str(user_id)
+        with self._lock:
+            return [r for (user, _), r in self._pending.items() if user == user_id]
+
+    def merge(self, user_id: str, rows: List[Dict]) -> List[Dict]:
+        """Přeloží nezapsané změny přes řádky user_progress načtené z Directusu."""
+        pending = {r["lesson"]: r for r in self.pending_for(user_id)}
+        if not pending:
+            return rows
+        merged = []
+        for row in rows:
+            record = pending.pop(str(row.get("lesson")), None)
+            if record is not None:
+                row = {**row, "completed": record["completed"],
+                       "completion_percentage": record["completion_percentage"]}
+            merged.append(row)
+        for record in pending.values():
+            merged.append({"user": record["user"], "lesson": record["lesson"],
+                           "completed": record["completed"],
+                           "completion_percentage": record["completion_percentage"]})
+        return merged
+
+    # ── Zápis ─────────────────────────────────────────────────────────────────
+
+    def _outage(self, error: Exception):
+        """Directus nejde — další pokus až po backoffu (full jitter)."""
+        self.failures += 1
+        delay = random.uniform(0, min(self.backoff_max, self.flush_interval * 2 ** self._outages))
+        self._outages += 1
+        self._retry_at = time.monotonic() + delay
+        print(f"⚠️ Progress flush: {error} — další pokus za {delay:.1f} s")
+
+    async def _write_each(self, batch: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """Dávku Directus odmítl — zapíše záznamy po jednom. Vrátí (zapsané, odmítnuté)."""
+        written, rejected = [], []
+        for record in batch:
+            try:
+                ok = await directus.upsert_user_progress([record])
+            except DirectusError as e:
+                self._outage(e)
+                break   # zbytek zůstane ve frontě
+            (written if ok else rejected).append(record)
+        return written, rejected
+
+    async def flush(self) -> int:
+        """Zapíše frontu hromadně do Directusu. Vrátí počet zapsaných záznamů."""
+        if self._flushing is None:
+            self._flushing = asyncio.Lock()
+        async with self._flushing:
+            with self._lock:
+                batch = list(self._pending.values())[:self.batch_size * 10]
+            if not batch:
+                return 0
+            self.flushes += 1
+            try:
+                ok = await directus.upsert_user_progress(batch)
+            except DirectusError as e:
+                self._outage(e)
+                return 0
+            if ok:
+                written, rejected = batch, []
+            else:
+                written, rejected = await self._write_each(batch)
+            # Backoff zrušíme, jen když se vyřídila celá dávka — po výpadku
+            # uprostřed _write_each musí platit (zapsaná část neznamená, že Directus jede)
+            if len(written) + len(rejected) == len(batch):
+                self._outages = 0
+                self._retry_at = 0.0
+
+            with self._lock:
+                for record in written + rejected:
+                    key = (record["user"], record["lesson"])
+                    # Mezitím mohl přijít novější stav — ten ve frontě zůstane
+                    if self._pending.get(key) is record:
+                        del self._pending[key]
+                acked = [record["id"] for record in written] + self._superseded
+                self._superseded = []
+            for record in rejected:
+                print(f"❌ Progress record rejected by Directus: user={record['user']} lesson={record['lesson']}")
+            self.dead += len(rejected)
+            self.dead_letters = (self.dead_letters + rejected)[-DEAD_LETTERS_KEPT:]
+            entries = [{"ack": record_id} for record_id in acked] + [{"dead": record} for record in rejected]
+            if entries:
+                await self._append_async(entries)
+            self.written += len(written)
+            if self._journal_lines >= self.compact_after:
+                await asyncio.get_running_loop().run_in_executor(None, self._compact)
+            return len(written)
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if time.monotonic() < self._retry_at:
+                continue   # backoff po výpadku — plná fronta ho nepřebije
+            try:
+                await self.flush()
+            except Exception as e:
+                self._outage(e)
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self.recover()
+        if self._pending:
+            print(f"✅ Progress journal: {len(self._pending)} nezapsaných záznamů obnoveno")
+        self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Co jde, zapíšeme hned; zbytek zůstane v žurnálu pro příští start
+        while self._pending and await self.flush():
+            pass
+        if self._owner_fd is not None:
+            if not self._pending:
+                # Vše zapsáno — žurnál už není potřeba (nejdřív žurnál, pak zámek)
+                for path in (self.journal_path, self.journal_path + ".lock"):
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+            os.close(self._owner_fd)   # uvolní zámek — zbytek převezme další worker
+            self._owner_fd = None
+
+    def stats(self) -> Dict:
+        return {
+            "pending": len(self._pending),
+            "enqueued": self.enqueued,
+            "deduplicated": self.deduplicated,
+            "flushes": self.flushes,
+            "written": self.written,
+            "failures": self.failures,
+            "retry_in": round(max(0.0, self._retry_at - time.monotonic()), 1),
+            "dead": self.dead,
+            "dead_letters": self.dead_letters[-10:],
+            "recovered": self.recovered,
+            "adopted": self.adopted,
+            "journal": self.journal_path,
+            "journal_lines": self._journal_lines,
+        }
+
+progress_writer = ProgressWriter(
+    journal_path=settings.PROGRESS_JOURNAL,
+    flush_interval=settings.PROGRESS_FLUSH_INTERVAL,
+    batch_size=settings.PROGRESS_BATCH_SIZE,
+)
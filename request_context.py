@@ -0,0 +1,122 @@
+"""
+Kontext jednoho HTTP požadavku: přihlášený uživatel a jeho pokrok.
+
+Token se dekóduje a pokrok načte nejvýš jednou za požadavek — výsledek se
+drží na request.state a handlery i další závislosti ho sdílejí přes
+Depends(request_user) / Depends(request_student).
+"""
+
+import asyncio
+import uuid
+from typing import Optional
+from fastapi import Request
+from config import settings
+from auth_directus import get_current_user_optional
+from call_budget import detached
+from cache import is_shared, progress_cache, progress_lkg_cache
+from data_service import data_service
+from directus_client import DirectusError
+from schemas import StudentProgress
+
+def _lkg_key(user_id: str) -> str:
+    # Vlastní klíč: se sqlite / redis sdílejí obě cache jedno úložiště, stejný
+    # klíč by 24h záložní kopií přepsal 60s čerstvý záznam (a delete obojí)
+    return f"progress_lkg:{user_id}"
+
+async def get_student_progress(user_id: str = None) -> StudentProgress:
+    """Pro nepřihlášené vrátí prázdný progress ihned (bez volání Directus)."""
+    if not user_id:
+        return StudentProgress(name="Host", completed_lessons=[], current_level="Úvod")
+
+    key = f"progress:{user_id}"
+    cached = progress_cache.get(key)
+    if cached:
+        return cached
+
+    # Načtení běží dál i po vypršení limitu — čerstvá data pak uloží pro další požadavek
+    fetch = asyncio.ensure_future(detached(_fetch_student_progress(user_id)))
+    fetch.add_done_callback(lambda t: t.cancelled() or t.exception())
+    try:
+        return await asyncio.wait_for(asyncio.shield(fetch), settings.PROGRESS_LATENCY_BUDGET)
+    except (DirectusError, asyncio.TimeoutError) as e:
+        print(f"⚠️ Progress unavailable for {user_id}: {e!r} — serving last known state")
+    # Výpadek nebo pomalý Directus: poslední známý stav (označený jako zastaralý), nic se necachuje
+    last_known = progress_lkg_cache.get(_lkg_key(user_id))
+    if last_known:
+        return data_service.with_pending(last_known.model_copy(update={"stale": True}), user_id)
+    return data_service.with_pending(
+        StudentProgress(name="Student", completed_lessons=[], current_level="Úvod", stale=True), user_id
+    )
+
+async def _fetch_student_progress(user_id: str) -> StudentProgress:
+    progress = await data_service.get_user_progress(user_id)
+    # Změna i mimo /update_progress (úprava v Directusu) musí změnit ETag stránek
+    previous = progress_lkg_cache.get(_lkg_key(user_id))
+    if previous is not None and previous != progress:
+        bump_progress_revision(user_id)
+    progress_cache.set(f"progress:{user_id}", progress, ttl=60)
+    progress_lkg_cache.set(_lkg_key(user_id), progress)
+    return progress
+
+# ── Revize pokroku (pro ETag) ─────────────────────────────────────────────────
+
+def progress_revision(user_id: str) -> str:
+    """Token, který se mění s každou změnou pokroku uživatele. Chybí-li, vznikne nový."""
+    return progress_cache.get(f"progress_rev:{user_id}") or bump_progress_revision(user_id)
+
+def bump_progress_revision(user_id: str) -> str:
+    revision = uuid.uuid4().hex[:16]
+    # delete() se u sdílené cache rozešle ostatním workerům — jinak by do
+    # vypršení lokální vrstvy drželi starou revizi a odpovídali 304
+    progress_cache.delete(f"progress_rev:{user_id}")
+    progress_cache.set(f"progress_rev:{user_id}", revision, ttl=settings.PROGRESS_LKG_TTL)
+    return revision
+
+def progress_revisions_shared() -> bool:
+    """Je revize pokroku společná všem workerům? (jen se sdíleným CACHE_BACKEND)"""
+    return is_shared(progress_cache)
+
+# ── Kontext požadavku ─────────────────────────────────────────────────────────
+
+_UNSET = object()
+
+class RequestContext:
+    def __init__(self, request: Request):
+        self.request = request
+        self._user = _UNSET
+        self._student: Optional[asyncio.Future] = None
+
+    async def user(self) -> Optional[dict]:
+        if self._user is _UNSET:
+            self._user = await get_current_user_optional(self.request)
+        return self._user
+
+    async def student(self) -> StudentProgress:
+        # Sdílený future — i souběžné závislosti počkají na jedno načtení
+        if self._student is None:
+            user = await self.user()
+            if self._student is None:
+                self._student = asyncio.ensure_future(get_student_progress(user.get("id") if user else None))
+        return await asyncio.shield(self._student)
+
+def get_request_context(request: Request) -> RequestContext:
+    ctx = getattr(request.state, "ctx", None)
+    if ctx is None:
+        ctx = request.state.ctx = RequestContext(request)
+    return ctx
+
+async def request_user(request: Request) -> Optional[dict]:
+    """Závislost: přihlášený uživatel (nebo None)."""
+    return await get_request_context(request).user()
+
+async def request_student(request: Request) -> StudentProgress:
+    """Závislost: pokrok přihlášeného uživatele, pro hosta prázdný."""
+    return await get_request_context(request).student()
+
+def sandbox_user_key(user: Optional[dict]) -> Optional[str]:
+    """Klíč pro limit SANDBOX_PER_USER — jen pro přihlášené.
+
+    Anonymní studenti ve třídě sdílejí IP adresu školní NAT, limit podle IP by
+    pustil jen jednoho z nich. Ty omezuje celková fronta sandboxu.
+    """
+    return user.get("id") if user else None
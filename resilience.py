@@ -0,0 +1,213 @@
+"""
+Odolnost volání Directusu: timeouty podle endpointu, opakování čtení
+s náhodným rozptylem, circuit breaker a volitelné "hedged" čtení.
+
+Když Directus padá nebo je pomalý, breaker se po `failure_threshold` chybách
+za sebou otevře a další volání hned selžou s DirectusUnavailable (místo
+čekání na timeout). Po `reset_timeout` s pustí jedno zkušební volání —
+když projde, breaker se zavře.
+"""
+
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Optional
+import httpx
+
+class DirectusError(Exception):
+    """Directus vrátil chybu serveru nebo neodpověděl."""
+
+class DirectusUnavailable(DirectusError):
+    """Breaker je otevřený — Directus se teď vůbec nevolá."""
+
+# Stavové kódy, u kterých má smysl čtení zopakovat
+RETRYABLE_STATUS = {500, 502, 503, 504}
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_running = False
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self):
+        """Vyhodí DirectusUnavailable, pokud se teď volat nemá."""
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probe_running:
+            self._probe_running = True
+            return
+        self.rejected += 1
+        raise DirectusUnavailable("Directus je dočasně nedostupný")
+
+    def record_success(self):
+        self.failures = 0
+        self._probe_running = False
+        self.state = self.CLOSED
+
+    def release(self):
+        """Volání skončilo bez výsledku (zrušení) — uvolní sondu, nic nepočítá."""
+        self._probe_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_running = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        stats = {"state": self.state, "failures": self.failures, "opened": self.opened, "rejected": self.rejected}
+        if self.state != self.CLOSED:
+            stats["retry_in"] = round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+        return stats
+
+Send = Callable[[float], Awaitable[httpx.Response]]
+
+class _Call:
+    """Výsledek jednoho logického volání (viz Resilience.guard)."""
+
+    def __init__(self):
+        self.failed = False
+
+class Resilience:
+    """Obal kolem jednotlivých HTTP volání (send(timeout) -> Response)."""
+
+    def __init__(self, read_timeout: float, write_timeout: float, read_deadline: float,
+                 retries: int, breaker: CircuitBreaker, hedge_after: float = 0.0,
+                 timeouts: Optional[Dict[str, float]] = None,
+                 backoff_base: float = 0.1, backoff_max: float = 1.0):
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.read_deadline = read_deadline
+        self.retries = retries
+        self.breaker = breaker
+        self.hedge_after = hedge_after
+        self.timeouts = timeouts or {}
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retried = 0
+        self.hedged = 0
+        self.failures: Dict[str, int] = {}
+
+    def timeout_for(self, endpoint: str, read: bool) -> float:
+        # Nejdelší shodný prefix: "items/user_progress" před "items"
+        while endpoint:
+            if endpoint in self.timeouts:
+                return self.timeouts[endpoint]
+            endpoint = endpoint.rpartition("/")[0]
+        return self.read_timeout if read else self.write_timeout
+
+    def _failed(self, endpoint: str):
+        self.failures[endpoint] = self.failures.get(endpoint, 0) + 1
+        self.breaker.record_failure()
+
+    @contextmanager
+    def guard(self, endpoint: str):
+        """Jedno logické volání: allow() a pak vždy právě jeden výsledek pro breaker.
+
+        Chyba (i neočekávaná, např. DecodingError) = jedno selhání bez ohledu
+        na počet opakování; 4xx a předčasně ukončený stream = úspěch; zrušení
+        jen uvolní zkušební volání. V HALF_OPEN tak sonda nikdy nezůstane viset.
+        """
+        self.breaker.allow()
+        call = _Call()
+        try:
+            yield call
+        except GeneratorExit:
+            self.breaker.record_success()   # čtenář streamu skončil dřív
+            raise
+        except Exception as e:
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code not in RETRYABLE_STATUS:
+                self.breaker.record_success()
+            else:
+                self._failed(endpoint)
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        if call.failed:
+            self._failed(endpoint)
+        else:
+            self.breaker.record_success()
+
+    async def read(self, endpoint: str, send: Send) -> httpx.Response:
+        """Idempotentní čtení: opakuje s rozptylem, dokud nevyprší `read_deadline`."""
+        with self.guard(endpoint):
+            deadline = time.monotonic() + self.read_deadline
+            attempt = 0
+            while True:
+                timeout = min(self.timeout_for(endpoint, read=True), max(0.1, deadline - time.monotonic()))
+                try:
+                    if self.hedge_after > 0:
+                        response = await self._hedged(send, timeout)
+                    else:
+                        response = await send(timeout)
+                    if response.status_code not in RETRYABLE_STATUS:
+                        return response
+                    error: Exception = DirectusError(f"{endpoint}: HTTP {response.status_code}")
+                except httpx.TransportError as e:
+                    error = DirectusError(f"{endpoint}: {type(e).__name__}")
+
+                # Full jitter: náhodně 0..min(max, base * 2^n)
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                attempt += 1
+                # Breaker mezitím otevřela jiná volání → dál nezkoušíme
+                if (attempt > self.retries or time.monotonic() + delay >= deadline
+                        or self.breaker.state == CircuitBreaker.OPEN):
+                    raise error
+                self.retried += 1
+                await asyncio.sleep(delay)
+
+    async def write(self, endpoint: str, send: Send) -> httpx.Response:
+        """Zápis se neopakuje (nemusí být idempotentní), jen timeout a breaker."""
+        with self.guard(endpoint) as call:
+            try:
+                response = await send(self.timeout_for(endpoint, read=False))
+            except httpx.TransportError as e:
+                raise DirectusError(f"{endpoint}: {type(e).__name__}") from e
+            call.failed = response.status_code in RETRYABLE_STATUS
+            return response
+
+    async def _hedged(self, send: Send, timeout: float) -> httpx.Response:
+        """Když první pokus neodpoví do `hedge_after` s, pošle druhý; vyhraje rychlejší."""
+        tasks = [asyncio.ensure_future(send(timeout))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                self.hedged += 1
+                tasks.append(asyncio.ensure_future(send(timeout)))
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict:
+        return {
+            "breaker": self.breaker.stats(),
+            "retried": self.retried,
+            "hedged": self.hedged,
+            "failures": dict(self.failures),
+        }
@@ -0,0 +1,154 @@
+"""
+Cache výsledků spuštění studentského kódu.
+
+Studenti v lekci posílají pořád dokola stejné programy ze zadání. Pokud
+je program deterministický (nečte vstup, nepoužívá náhodu ani čas, importuje
+jen bezpečné moduly), jeho výstup závisí jen na zdrojovém kódu — a ten
+identifikujeme hashem normalizovaného AST, takže na komentářích, mezerách
+a formátování nezáleží. Ukládají se jen běhy, které doběhly bez chyby.
+"""
+
+import ast
+import hashlib
+from typing import AsyncIterator, Dict, List, Optional
+from cache import TTLCache
+from config import settings
+from sandbox import sandbox
+
+# Moduly, jejichž výsledek závisí jen na vstupních datech
+SAFE_MODULES = {
+    "math", "cmath", "turtle", "string", "itertools", "functools", "operator",
+    "collections", "fractions", "decimal", "statistics", "heapq", "bisect",
+    "textwrap", "re", "copy", "dataclasses", "enum", "typing",
+}
+
+# Vestavěné funkce se vstupem, vedlejšími efekty nebo nedeterministickým výsledkem
+# (hash(object()) i id() vychází z adresy objektu — PYTHONHASHSEED nepomůže)
+UNSAFE_NAMES = {
+    "input", "open", "id", "hash", "eval", "exec", "compile", "breakpoint",
+    "globals", "locals", "vars", "getattr", "setattr", "delattr", "memoryview", "help",
+}
+
+# Výchozí repr objektů obsahuje adresu v paměti (<object at 0x7f...>)
+MEMORY_ADDRESS = " at 0x"
+
+def _is_dunder(name: str) -> bool:
+    return name.startswith("__")
+
+def _is_deterministic(tree: ast.AST) -> bool:
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            if any(alias.name.split(".")[0] not in SAFE_MODULES for alias in node.names):
+                return False
+        elif isinstance(node, ast.ImportFrom):
+            if node.level or (node.module or "").split(".")[0] not in SAFE_MODULES:
+                return False
+        elif isinstance(node, ast.Name):
+            # __builtins__, __import__ apod. obchází kontrolu importů
+            if node.id in UNSAFE_NAMES or _is_dunder(node.id):
+                return False
+        elif isinstance(node, ast.Attribute) and _is_dunder(node.attr):
+            # Přístup k __class__, __subclasses__ apod. obchází kontrolu importů
+            return False
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str) and _is_dunder(node.value):
+            # __builtins__['__import__'], operator.attrgetter('__class__')
+            return False
+    return True
+
+def program_key(code: str, mode: str = "python") -> Optional[str]:
+    """Hash normalizovaného AST programu, nebo None, když program nejde cachovat."""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+    if not _is_deterministic(tree):
+        return None
+    normalized = ast.dump(tree, annotate_fields=False, include_attributes=False)
+    return f"{mode}:" + hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+class RunCache:
+    """Výsledky deterministických programů v omezené LRU cache (TTLCache)."""
+
+    def __init__(self, default_ttl: int, max_size: int):
+        self._results = TTLCache(default_ttl=default_ttl, max_size=max_size)
+        # Doslovný text programu -> klíč, ať se stejné odeslání neparsuje znovu
+        self._keys = TTLCache(default_ttl=default_ttl, max_size=max_size)
+        self.uncacheable = 0
+
+    def key(self, code: str, mode: str = "python") -> Optional[str]:
+        source = f"{mode}:" + hashlib.sha256(code.encode("utf-8")).hexdigest()
+        key = self._keys.get(source)
+        if key is None:
+            key = program_key(code, mode) or ""
+            self._keys.set(source, key)
+        if not key:
+            self.uncacheable += 1
+            return None
+        return key
+
+    def _store(self, key: Optional[str], result: Dict):
+        # Jen dokončené běhy — chyby, timeouty a zkrácený výstup se neukládají
+        if key is None or result.get("return_code") != 0:
+            return
+        # print(object()) — adresa se liší běh od běhu, výstup není deterministický
+        if MEMORY_ADDRESS in result["output"] or MEMORY_ADDRESS in result["error"]:
+            self.uncacheable += 1
+            return
+        self._results.set(key, result)
+
+    async def run(self, code: str, user_key: Optional[str] = None, mode: str = "python") -> Dict:
+        """Jako sandbox.run(), ale stejný deterministický program se spustí jen jednou."""
+        key = self.key(code, mode)
+        if key is not None:
+            cached = self._results.get(key)
+            if cached is not None:
+                return cached
+        result = await sandbox.run(code, user_key=user_key, mode=mode)
+        self._store(key, result)
+        return result
+
+    async def stream(self, code: str, user_key: Optional[str] = None,
+                     mode: str = "python") -> AsyncIterator[Dict]:
+        """Jako sandbox.stream(); z cache přehraje výsledek jako jednu dávku událostí."""
+        key = self.key(code, mode)
+        if key is not None:
+            cached = self._results.get(key)
+            if cached is not None:
+                if cached["output"]:
+                    yield {"type": "stdout", "data": cached["output"]}
+                if cached["error"]:
+                    yield {"type": "stderr", "data": cached["error"]}
+                if cached.get("commands"):
+                    yield {"type": "turtle", "commands": cached["commands"]}
+                yield {"type": "exit", "return_code": cached["return_code"]}
+                return
+
+        output: List[str] = []
+        errors: List[str] = []
+        commands: List[Dict] = []
+        events = sandbox.stream(code, user_key=user_key, mode=mode)
+        try:
+            async for event in events:
+                kind = event["type"]
+                if kind == "stdout":
+                    output.append(event["data"])
+                elif kind == "stderr":
+                    errors.append(event["data"])
+                elif kind == "turtle":
+                    commands.extend(event["commands"])
+                elif kind == "exit":
+                    result = {"output": "".join(output), "error": "".join(errors),
+                              "return_code": event["return_code"]}
+                    if mode == "turtle":
+                        result["commands"] = commands
+                    self._store(key, result)
+                yield event
+        finally:
+            await events.aclose()
+
+    def stats(self) -> Dict:
+        stats = self._results.stats()
+        stats["uncacheable"] = self.uncacheable
+        return stats
+
+run_cache = RunCache(default_ttl=settings.RUN_CACHE_TTL, max_size=settings.RUN_CACHE_SIZE)
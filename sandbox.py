@@ -0,0 +1,275 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+from config import settings
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+
+class SandboxBusy(Exception):
+    """Fronta je plná nebo uživatel už má spuštěný maximální počet programů."""
+
+class SandboxPool:
+    """Pool předem spuštěných workerů pro spouštění studentského kódu.
+
+    Každý worker je samostatný interpreter, který už naběhl a čeká na kód
+    na stdin (bez dočasných souborů). Po jednom běhu skončí a pool na pozadí
+    nastartuje náhradu, takže start interpreteru není na kritické cestě.
+    Souběh je omezený semaforem, fronta má pevnou délku a každý uživatel
+    smí mít spuštěno jen `per_user` programů najednou.
+    """
+
+    def __init__(self, size: int, max_concurrent: int, max_queue: int, per_user: int,
+                 timeout: float, cpu_seconds: int, memory_mb: int, max_output: int,
+                 turtle_max_steps: int, turtle_max_commands: int):
+        self.size = size
+        self.max_queue = max_queue
+        self.per_user = per_user
+        self.timeout = timeout
+        self.limits = {
+            "cpu_seconds": cpu_seconds, "memory_mb": memory_mb, "max_output": max_output,
+            "max_steps": turtle_max_steps, "max_commands": turtle_max_commands,
+        }
+        self._max_concurrent = max_concurrent
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._idle: List[asyncio.subprocess.Process] = []
+        self._spawning = 0
+        self._waiting = 0
+        self._running = 0
+        self._per_user: Dict[str, int] = {}
+        self.started = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.cold_starts = 0
+
+    # ── Workery ───────────────────────────────────────────────────────────────
+
+    async def _spawn(self) -> asyncio.subprocess.Process:
+        # Čisté prostředí: studentský kód nesmí vidět SECRET_KEY ani DIRECTUS_TOKEN
+        env = {"PATH": os.environ.get("PATH", ""), "PYTHONIOENCODING": "utf-8", "PYTHONHASHSEED": "0"}
+        return await asyncio.create_subprocess_exec(
+            sys.executable, "-E", "-s", "-u", WORKER_SCRIPT,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=tempfile.gettempdir(),
+            env=env,
+            limit=1024 * 1024,
+        )
+
+    async def _replenish(self):
+        """Doplní pool na `size` čekajících workerů."""
+        while len(self._idle) + self._spawning < self.size:
+            self._spawning += 1
+            try:
+                self._idle.append(await self._spawn())
+            except Exception as e:
+                print(f"❌ Sandbox spawn error: {e}")
+                return
+            finally:
+                self._spawning -= 1
+
+    async def _acquire(self) -> asyncio.subprocess.Process:
+        while self._idle:
+            proc = self._idle.pop()
+            if proc.returncode is None:
+                asyncio.ensure_future(self._replenish())
+                return proc
+        self.cold_starts += 1
+        asyncio.ensure_future(self._replenish())
+        return await self._spawn()
+
+    async def start(self):
+        self._slots = asyncio.Semaphore(self._max_concurrent)
+        await self._replenish()
+
+    async def stop(self):
+        for proc in self._idle:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+        self._idle.clear()
+
+    # ── Přijímání úloh ────────────────────────────────────────────────────────
+
+    @asynccontextmanager
+    async def _admit(self, user_key: Optional[str]):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._max_concurrent)
+        if user_key and self._per_user.get(user_key, 0) >= self.per_user:
+            self.rejected += 1
+            raise SandboxBusy("Už ti běží jiný program — počkej, až doběhne.")
+        if self._waiting >= self.max_queue:
+            self.rejected += 1
+            raise SandboxBusy("Server je teď přetížený, zkus to za chvilku znovu.")
+
+        if user_key:
+            self._per_user[user_key] = self._per_user.get(user_key, 0) + 1
+        try:
+            self._waiting += 1
+            try:
+                await self._slots.acquire()
+            finally:
+                self._waiting -= 1
+            self._running += 1
+            try:
+                yield
+            finally:
+                self._running -= 1
+                self._slots.release()
+        finally:
+            if user_key:
+                self._per_user[user_key] -= 1
+                if not self._per_user[user_key]:
+                    del self._per_user[user_key]
+
+    # ── Spuštění ──────────────────────────────────────────────────────────────
+
+    async def stream(self, code: str, user_key: Optional[str] = None,
+                     mode: str = "python") -> AsyncIterator[Dict]:
+        """Spustí kód a průběžně vrací události, jak je worker posílá:
+
+            {"type": "stdout", "data": ...}, {"type": "stderr", "data": ...},
+            {"type": "turtle", "commands": [...]}, {"type": "error", "error": ...},
+            {"type": "exit", "return_code": ...}
+
+        Když konzument přestane číst (aclose / zrušení úlohy), worker se hned
+        zabije. Vyhodí SandboxBusy, pokud je fronta plná nebo uživatel překročil limit.
+        """
+        async with self._admit(user_key):
+            proc = await self._acquire()
+            self.started += 1
+            return_code = None
+            timed_out = False
+            try:
+                request = json.dumps({"code": code, "mode": mode, "limits": self.limits}) + "\n"
+                proc.stdin.write(request.encode("utf-8"))
+                await proc.stdin.drain()
+                proc.stdin.close()
+
+                deadline = time.monotonic() + self.timeout
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    line = await asyncio.wait_for(proc.stdout.readline(), remaining)
+                    if not line:
+                        break
+                    frame = _parse_frame(line)
+                    if frame["t"] == "exit":
+                        return_code = frame.get("code", 0)
+                        break
+                    if frame["t"] == "turtle":
+                        yield {"type": "turtle", "commands": frame.get("c", [])}
+                    else:
+                        yield {"type": "stderr" if frame["t"] == "err" else "stdout", "data": frame.get("d", "")}
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                timed_out = True
+            except (asyncio.CancelledError, GeneratorExit):
+                self.cancelled += 1
+                raise
+            finally:
+                self.completed += 1
+                # Po timeoutu program pořád běží — zabít hned, ne čekat na konec
+                stderr = await self._finish(proc, graceful=return_code is not None and not timed_out)
+
+            if timed_out:
+                yield {"type": "error", "error": f"Kód běžel příliš dlouho (max {self.timeout:g} sekund)"}
+                return
+            if return_code is None:
+                # Worker spadl bez rámce "exit" — typicky překročený limit CPU/paměti
+                yield {
+                    "type": "stderr",
+                    "data": stderr.decode("utf-8", errors="replace")
+                            + "Program byl ukončen (překročen limit procesoru nebo paměti)."
+                }
+                return_code = proc.returncode if proc.returncode else 1
+            yield {"type": "exit", "return_code": return_code}
+
+    async def run(self, code: str, user_key: Optional[str] = None, mode: str = "python") -> Dict:
+        """Spustí kód v sandboxu a počká na konec. Vrátí {"output", "error", "return_code"}.
+
+        V režimu "turtle" vrátí navíc "commands" — zaznamenané příkazy želvy.
+        Vyhodí SandboxBusy, pokud je fronta plná nebo uživatel překročil limit.
+        """
+        output: List[str] = []
+        errors: List[str] = []
+        commands: List[Dict] = []
+        return_code = None
+        events = self.stream(code, user_key=user_key, mode=mode)
+        try:
+            async for event in events:
+                kind = event["type"]
+                if kind == "stdout":
+                    output.append(event["data"])
+                elif kind == "stderr":
+                    errors.append(event["data"])
+                elif kind == "turtle":
+                    commands.extend(event["commands"])
+                elif kind == "error":
+                    return {"error": event["error"]}
+                elif kind == "exit":
+                    return_code = event["return_code"]
+        finally:
+            await events.aclose()
+
+        result = {"output": "".join(output), "error": "".join(errors), "return_code": return_code}
+        if mode == "turtle":
+            result["commands"] = commands
+        return result
+
+    async def _finish(self, proc: asyncio.subprocess.Process, graceful: bool) -> bytes:
+        """Počká na konec workeru (po rámci "exit" skončí sám), jinak ho zabije."""
+        if graceful:
+            try:
+                await asyncio.wait_for(proc.wait(), 1.0)
+            except asyncio.TimeoutError:
+                pass
+        if proc.returncode is None:
+            proc.kill()
+        stderr = await proc.stderr.read(self.limits["max_output"])
+        await proc.wait()
+        return stderr
+
+    def stats(self) -> Dict:
+        return {
+            "idle_workers": len(self._idle),
+            "running": self._running,
+            "queued": self._waiting,
+            "started": self.started,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+            "cold_starts": self.cold_starts,
+        }
+
+def _parse_frame(line: bytes) -> Dict:
+    try:
+        frame = json.loads(line)
+        if isinstance(frame, dict) and "t" in frame:
+            return frame
+    except ValueError:
+        pass
+    # Student zapsal přímo na fd 1 (os.write) — bereme jako obyčejný výstup
+    return {"t": "out", "d": line.decode("utf-8", errors="replace")}
+
+sandbox = SandboxPool(
+    size=settings.SANDBOX_POOL_SIZE,
+    max_concurrent=settings.SANDBOX_MAX_CONCURRENT,
+    max_queue=settings.SANDBOX_MAX_QUEUE,
+    per_user=settings.SANDBOX_PER_USER,
+    timeout=settings.SANDBOX_TIMEOUT,
+    cpu_seconds=settings.SANDBOX_CPU_SECONDS,
+    memory_mb=settings.SANDBOX_MEMORY_MB,
+    max_output=settings.SANDBOX_MAX_OUTPUT,
+    turtle_max_steps=settings.TURTLE_MAX_STEPS,
+    turtle_max_commands=settings.TURTLE_MAX_COMMANDS,
+)
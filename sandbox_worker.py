@@ -0,0 +1,160 @@
+"""
+Předem spuštěný worker sandboxu pro studentský kód.
+
+Proces se spustí dopředu (interpreter je už nahraný) a čeká na stdin.
+Rodič mu pošle jeden JSON řádek {"code": ..., "limits": {...}}, worker
+nastaví limity, kód spustí a skončí. Výstup posílá na stdout jako JSON
+rámce po řádcích:
+
+    {"t": "out", "d": "..."}     stdout studenta
+    {"t": "err", "d": "..."}     stderr studenta (včetně tracebacku)
+    {"t": "turtle", "c": [...]}  dávka příkazů želvy (jen v režimu "turtle")
+    {"t": "exit", "code": 0}     konec běhu
+
+V režimu "turtle" se místo skutečného modulu turtle použije záznamová
+náhrada (turtle_shim) a délka běhu je omezena počtem kroků, ne časem.
+"""
+
+import json
+import os
+import sys
+import traceback
+
+# Načteno předem, ať import není na kritické cestě běhu
+import turtle_shim
+
+FRAME_CHUNK = 4096
+
+class FrameChannel:
+    """Zápis JSON rámců do původního stdout procesu."""
+
+    def __init__(self, fd: int, max_output: int):
+        self._fd = fd
+        self.max_output = max_output
+        self.written = 0
+
+    def send(self, frame: dict):
+        data = (json.dumps(frame, ensure_ascii=False) + "\n").encode("utf-8")
+        while data:
+            n = os.write(self._fd, data)
+            data = data[n:]
+
+    def send_text(self, stream: str, text: str):
+        self.written += len(text)
+        if self.written > self.max_output:
+            allowed = max(0, len(text) - (self.written - self.max_output))
+            if allowed:
+                self.send({"t": stream, "d": text[:allowed]})
+            self.send({"t": "err", "d": f"\n[Výstup zkrácen — limit {self.max_output} znaků]\n"})
+            self.send({"t": "exit", "code": 1})
+            os._exit(1)
+        for i in range(0, len(text), FRAME_CHUNK):
+            self.send({"t": stream, "d": text[i:i + FRAME_CHUNK]})
+
+class FrameWriter:
+    """Náhrada sys.stdout/sys.stderr — bufferuje a posílá rámce po řádcích."""
+
+    encoding = "utf-8"
+    errors = "replace"
+
+    def __init__(self, channel: FrameChannel, stream: str):
+        self._channel = channel
+        self._stream = stream
+        self._buffer = []
+        self._size = 0
+
+    def write(self, text) -> int:
+        text = str(text)
+        self._buffer.append(text)
+        self._size += len(text)
+        if "\n" in text or self._size >= FRAME_CHUNK:
+            self.flush()
+        return len(text)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        if self._buffer:
+            text = "".join(self._buffer)
+            self._buffer, self._size = [], 0
+            self._channel.send_text(self._stream, text)
+
+    def isatty(self) -> bool:
+        return False
+
+def apply_limits(limits: dict):
+    """Limity CPU času a paměti (jen na POSIX, kde je modul resource)."""
+    try:
+        import resource
+    except ImportError:
+        return
+    cpu = int(limits.get("cpu_seconds", 0))
+    if cpu > 0:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    memory = int(limits.get("memory_mb", 0))
+    if memory > 0:
+        resource.setrlimit(resource.RLIMIT_AS, (memory * 1024 * 1024,) * 2)
+    # Student nesmí zapisovat soubory
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+
+def run(request: dict, channel: FrameChannel) -> int:
+    out = FrameWriter(channel, "out")
+    err = FrameWriter(channel, "err")
+    limits = request.get("limits", {})
+    recorder = None
+    tracer = None
+    limit_error = ()
+    if request.get("mode") == "turtle":
+        recorder = turtle_shim.install(
+            lambda commands: channel.send({"t": "turtle", "c": commands}),
+            int(limits.get("max_commands", 50_000)),
+        )
+        tracer = turtle_shim.step_budget(int(limits.get("max_steps", 200_000)))
+        limit_error = turtle_shim.TurtleLimitExceeded
+
+    sys.stdout, sys.stderr = out, err
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+    exit_code = 0
+    try:
+        code = compile(request["code"], "<student>", "exec")
+        sys.settrace(tracer)
+        try:
+            exec(code, namespace)
+        finally:
+            sys.settrace(None)
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except limit_error as e:
+        err.write(f"{e}\n")
+        exit_code = 1
+    except BaseException:
+        etype, value, tb = sys.exc_info()
+        # Traceback jen z kódu studenta, bez rámců workeru
+        while tb is not None and tb.tb_frame.f_code.co_filename != "<student>":
+            tb = tb.tb_next
+        traceback.print_exception(etype, value, tb, file=err)
+        exit_code = 1
+    if recorder is not None:
+        # I po chybě pošleme, co se stihlo nakreslit
+        recorder.flush()
+    out.flush()
+    err.flush()
+    return exit_code
+
+def main():
+    channel_fd = os.dup(1)
+    line = sys.stdin.buffer.readline()
+    if not line:
+        return
+    request = json.loads(line)
+    limits = request.get("limits", {})
+    channel = FrameChannel(channel_fd, int(limits.get("max_output", 64_000)))
+    apply_limits(limits)
+    exit_code = run(request, channel)
+    channel.send({"t": "exit", "code": exit_code})
+    os._exit(0)
+
+if __name__ == "__main__":
+    main()
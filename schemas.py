@@ -115,6 +115,7 @@ class StudentProgress(BaseModel):
     current_level: str = "Úvod"
     total_points: int = 0
     achievements: List[UserAchievementResponse] = []
+    stale: bool = False   # True = poslední známý stav, Directus teď neodpovídá
 
 # Lesson progress API
 class LessonProgress(BaseModel):
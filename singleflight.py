@@ -0,0 +1,37 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from call_budget import detached
+
+class SingleFlight:
+    """Sloučí souběžná identická volání do jednoho (single-flight).
+
+    První volající spustí `fn()`, ostatní se stejným klíčem jen počkají
+    na výsledek (nebo výjimku) téhož volání.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0       # skutečně provedená volání
+        self.coalesced = 0   # volání, která se přidala k již běžícímu
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            # Volání sdílí víc požadavků — nepočítá se žádnému z nich
+            task = asyncio.ensure_future(detached(fn()))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, k=key: self._inflight.pop(k, None))
+        else:
+            self.coalesced += 1
+        # shield: zrušení jednoho čekajícího nezruší volání ostatním
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict:
+        total = self.calls + self.coalesced
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "coalesced_ratio": round(self.coalesced / total, 3) if total else 0.0,
+        }
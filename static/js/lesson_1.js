@@ -40,20 +40,17 @@ async function runPythonCode() {
     
     try {
         // OPTION 2: Pošli kód na backend API
-        const response = await fetch('/api/run-python', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ code: code })
-        });
-        
-        const result = await response.json();
+        // Binární kresbu (turtle_canvas.js) si vyžádá přes Accept, jinak JSON
+        const result = await runTurtleProgram(code);
         
         if (result.success) {
             statusEl.textContent = '✅ Hotovo!';
-            drawTurtleOutput(result.commands);
+            drawTurtleOutput(result);
+            document.getElementById('console-output').textContent = result.output || '';
             checkForSquare(code);
         } else {
             statusEl.textContent = '❌ Chyba!';
+            drawTurtleOutput(result);
             document.getElementById('console-output').textContent = result.error;
         }
         
@@ -63,39 +60,10 @@ async function runPythonCode() {
     }
 }
 
-// Draw turtle graphics on canvas
-function drawTurtleOutput(commands) {
+// Draw turtle graphics on canvas (renderer: turtle_canvas.js)
+function drawTurtleOutput(result) {
     const canvas = document.getElementById('turtle-canvas');
-    const ctx = canvas.getContext('2d');
-    
-    // Clear canvas
-    ctx.clearRect(0, 0, canvas.width, canvas.height);
-    
-    // Initial turtle position
-    let x = canvas.width / 2;
-    let y = canvas.height / 2;
-    let angle = 0; // 0 = right, 90 = down, etc.
-    
-    ctx.beginPath();
-    ctx.moveTo(x, y);
-    ctx.strokeStyle = '#3B82F6';
-    ctx.lineWidth = 2;
-    
-    // Execute turtle commands
-    commands.forEach(cmd => {
-        if (cmd.type === 'forward') {
-            const radians = (angle * Math.PI) / 180;
-            x += cmd.distance * Math.cos(radians);
-            y += cmd.distance * Math.sin(radians);
-            ctx.lineTo(x, y);
-        } else if (cmd.type === 'right') {
-            angle += cmd.degrees;
-        } else if (cmd.type === 'left') {
-            angle -= cmd.degrees;
-        }
-    });
-    
-    ctx.stroke();
+    renderTurtleResult(canvas, result);
 }
 
 // Check if user drew a square (simple detection)
@@ -55,20 +55,17 @@ async function runPythonCode() {
     statusEl.textContent = '⏳ Spouštím...';
     
     try {
-        const response = await fetch('/api/run-python', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ code: code })
-        });
-        
-        const result = await response.json();
+        // Binární kresbu (turtle_canvas.js) si vyžádá přes Accept, jinak JSON
+        const result = await runTurtleProgram(code);
         
         if (result.success) {
             statusEl.textContent = '✅ Hotovo!';
-            drawTurtleOutput(result.commands);
+            drawTurtleOutput(result);
+            document.getElementById('console-output').textContent = result.output || '';
             checkForSpiral(code);
         } else {
             statusEl.textContent = '❌ Chyba!';
+            drawTurtleOutput(result);
             document.getElementById('console-output').textContent = result.error;
         }
     } catch (error) {
@@ -77,47 +74,10 @@ async function runPythonCode() {
     }
 }
 
-// Draw turtle graphics on canvas
-function drawTurtleOutput(commands) {
+// Draw turtle graphics on canvas (renderer: turtle_canvas.js)
+function drawTurtleOutput(result) {
     const canvas = document.getElementById('turtle-canvas');
-    const ctx = canvas.getContext('2d');
-    
-    // Clear canvas
-    ctx.clearRect(0, 0, canvas.width, canvas.height);
-    
-    // Initial turtle position
-    let x = canvas.width / 2;
-    let y = canvas.height / 2;
-    let angle = 0;
-    
-    ctx.beginPath();
-    ctx.moveTo(x, y);
-    ctx.strokeStyle = '#3B82F6';
-    ctx.lineWidth = 2;
-    
-    // Execute turtle commands
-    commands.forEach((cmd, index) => {
-        if (cmd.type === 'forward') {
-            const radians = (angle * Math.PI) / 180;
-            x += cmd.distance * Math.cos(radians);
-            y += cmd.distance * Math.sin(radians);
-            ctx.lineTo(x, y);
-            
-            // Cycle through colors for spiral effect
-            if (commands.length > 50) {
-                const hue = (index * 360 / commands.length) % 360;
-                ctx.strokeStyle = `hsl(${hue}, 70%, 50%)`;
-            }
-        } else if (cmd.type === 'right') {
-            angle += cmd.degrees;
-        } else if (cmd.type === 'left') {
-            angle -= cmd.degrees;
-        }
-    });
-    
-    ctx.stroke();
-    ctx.beginPath();
-    ctx.moveTo(x, y);
+    renderTurtleResult(canvas, result, { rainbow: true });
 }
 
 // Check if user created a spiral
@@ -0,0 +1,309 @@
+// ===== TURTLE CANVAS =====
+// Vykreslí proud příkazů želvy z /api/run-python (viz turtle_shim.py).
+// Souřadnice jsou v konvenci modulu turtle: střed plátna = (0, 0),
+// osa y nahoru, úhel 0° = východ, kladně proti směru hodinových ručiček.
+
+function renderTurtleCommands(canvas, commands, options = {}) {
+    const ctx = canvas.getContext('2d');
+    const cx = canvas.width / 2;
+    const cy = canvas.height / 2;
+    const defaultColor = options.color || '#3B82F6';
+    const rainbow = options.rainbow && commands.length > 50;
+    const turtles = {};
+
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    ctx.lineCap = 'round';
+    ctx.lineJoin = 'round';
+
+    function getTurtle(id) {
+        if (!turtles[id]) {
+            turtles[id] = {
+                x: 0, y: 0, heading: 0, down: true,
+                color: defaultColor, fillColor: defaultColor,
+                customColor: false, width: 2, fill: null
+            };
+        }
+        return turtles[id];
+    }
+
+    function moveTo(t, nx, ny, index) {
+        if (t.down) {
+            ctx.beginPath();
+            ctx.moveTo(cx + t.x, cy - t.y);
+            ctx.lineTo(cx + nx, cy - ny);
+            if (rainbow && !t.customColor) {
+                // Duhový efekt pro spirály (jen když si student barvu nezvolil)
+                ctx.strokeStyle = `hsl(${(index * 360 / commands.length) % 360}, 70%, 50%)`;
+            } else {
+                ctx.strokeStyle = t.color;
+            }
+            ctx.lineWidth = t.width;
+            ctx.stroke();
+        }
+        if (t.fill) {
+            t.fill.push([nx, ny]);
+        }
+        t.x = nx;
+        t.y = ny;
+    }
+
+    function forward(t, distance, index) {
+        const radians = (t.heading * Math.PI) / 180;
+        moveTo(t, t.x + distance * Math.cos(radians), t.y + distance * Math.sin(radians), index);
+    }
+
+    commands.forEach((cmd, index) => {
+        const t = getTurtle(cmd.turtle || 0);
+        switch (cmd.type) {
+            case 'forward':
+                forward(t, cmd.distance, index);
+                break;
+            case 'right':
+                t.heading -= cmd.degrees;
+                break;
+            case 'left':
+                t.heading += cmd.degrees;
+                break;
+            case 'goto':
+                moveTo(t, cmd.x, cmd.y, index);
+                break;
+            case 'circle': {
+                // Stejný mnohoúhelník jako turtle.circle v Pythonu
+                let w = cmd.extent / cmd.steps;
+                let w2 = w / 2;
+                let length = 2 * cmd.radius * Math.sin((w2 * Math.PI) / 180);
+                if (cmd.radius < 0) {
+                    length = -length; w = -w; w2 = -w2;
+                }
+                t.heading += w2;
+                // Server posílá nejvýš 360 úseků (turtle_shim.MAX_CIRCLE_STEPS)
+                const steps = Math.min(cmd.steps, 360);
+                for (let i = 0; i < steps; i++) {
+                    forward(t, length, index);
+                    t.heading += w;
+                }
+                t.heading -= w2;
+                break;
+            }
+            case 'penup':
+                t.down = false;
+                break;
+            case 'pendown':
+                t.down = true;
+                break;
+            case 'color':
+                t.color = cmd.color;
+                t.customColor = true;
+                break;
+            case 'fillcolor':
+                t.fillColor = cmd.color;
+                break;
+            case 'width':
+                t.width = cmd.width;
+                break;
+            case 'begin_fill':
+                t.fill = [[t.x, t.y]];
+                break;
+            case 'end_fill':
+                if (t.fill && t.fill.length > 2) {
+                    ctx.beginPath();
+                    t.fill.forEach(([px, py], i) => {
+                        if (i === 0) ctx.moveTo(cx + px, cy - py);
+                        else ctx.lineTo(cx + px, cy - py);
+                    });
+                    ctx.closePath();
+                    ctx.fillStyle = t.fillColor;
+                    ctx.fill();
+                }
+                t.fill = null;
+                break;
+            case 'dot':
+                ctx.beginPath();
+                ctx.arc(cx + t.x, cy - t.y, cmd.size / 2, 0, 2 * Math.PI);
+                ctx.fillStyle = cmd.color || t.color;
+                ctx.fill();
+                break;
+            case 'write':
+                ctx.font = `${Math.max(8, cmd.size || 8) * 1.5}px Arial`;
+                ctx.textAlign = cmd.align || 'left';
+                ctx.fillStyle = t.color;
+                ctx.fillText(cmd.text, cx + t.x, cy - t.y);
+                break;
+            case 'bgcolor':
+                ctx.save();
+                ctx.globalCompositeOperation = 'destination-over';
+                ctx.fillStyle = cmd.color;
+                ctx.fillRect(0, 0, canvas.width, canvas.height);
+                ctx.restore();
+                break;
+            case 'clear':
+                ctx.clearRect(0, 0, canvas.width, canvas.height);
+                break;
+            // 'speed' nemá na statické vykreslení vliv
+        }
+    });
+}
+
+// ===== BINÁRNÍ FORMÁT KRESBY (application/x-turtle-polyline) =====
+// Server pošle hotovou geometrii (viz turtle_codec.py): lomené čáry
+// s delta-kódovanými body, výplně, tečky a texty. Každá čára se vykreslí
+// jediným stroke(), takže i spirála s tisíci úseky je hned hotová.
+
+const TURTLE_POLYLINE_TYPE = 'application/x-turtle-polyline';
+const TURTLE_ALIGN = ['left', 'center', 'right'];
+
+function decodeTurtlePolyline(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== 'NGT1') {
+        throw new Error('Neznámý formát kresby');
+    }
+    const count = view.getUint32(4, true);
+    const stringBytes = view.getUint32(8, true);
+    const outputIdx = view.getInt32(12, true);
+    const strings = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 16, stringBytes)));
+
+    let offset = 16 + stringBytes;
+    const items = [];
+    for (let n = 0; n < count; n++) {
+        const kind = view.getInt32(offset, true);
+        const a = view.getInt32(offset + 4, true);
+        const b = view.getInt32(offset + 8, true);
+        const npoints = view.getInt32(offset + 12, true);
+        offset += 16;
+        const item = { kind, color: strings[a] };
+
+        if (kind === 1 || kind === 2) {
+            // První bod absolutně, další jako int16 delty v desetinách pixelu
+            let qx = Math.round(view.getFloat32(offset, true) * 10);
+            let qy = Math.round(view.getFloat32(offset + 4, true) * 10);
+            offset += 8;
+            const deltas = new Int16Array(buffer, offset, (npoints - 1) * 2);
+            const points = new Float32Array(npoints * 2);
+            points[0] = qx / 10;
+            points[1] = qy / 10;
+            for (let i = 0; i < deltas.length; i += 2) {
+                qx += deltas[i];
+                qy += deltas[i + 1];
+                points[i + 2] = qx / 10;
+                points[i + 3] = qy / 10;
+            }
+            offset += Math.ceil(deltas.byteLength / 4) * 4;
+            item.points = points;
+            item.width = b / 100;
+        } else if (kind === 3) {
+            item.size = b / 100;
+            item.x = view.getFloat32(offset, true);
+            item.y = view.getFloat32(offset + 4, true);
+            offset += 8;
+        } else if (kind === 4) {
+            item.text = strings[b];
+            item.size = view.getInt32(offset, true) / 100;
+            item.align = TURTLE_ALIGN[view.getInt32(offset + 4, true)] || 'left';
+            item.x = view.getFloat32(offset + 8, true);
+            item.y = view.getFloat32(offset + 12, true);
+            offset += 16;
+        }
+        items.push(item);
+    }
+    return { items, output: outputIdx >= 0 ? strings[outputIdx] : '' };
+}
+
+function renderTurtlePolyline(canvas, drawing, options = {}) {
+    const ctx = canvas.getContext('2d');
+    const cx = canvas.width / 2;
+    const cy = canvas.height / 2;
+    const defaultColor = options.color || '#3B82F6';
+    const segments = drawing.items.reduce((n, item) => n + (item.kind === 1 ? item.points.length / 2 - 1 : 0), 0);
+    const rainbow = options.rainbow && segments > 50;
+    let segmentIndex = 0;
+
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    ctx.lineCap = 'round';
+    ctx.lineJoin = 'round';
+
+    function tracePath(points) {
+        ctx.beginPath();
+        ctx.moveTo(cx + points[0], cy - points[1]);
+        for (let i = 2; i < points.length; i += 2) {
+            ctx.lineTo(cx + points[i], cy - points[i + 1]);
+        }
+    }
+
+    drawing.items.forEach(item => {
+        switch (item.kind) {
+            case 1:
+                ctx.lineWidth = item.width;
+                if (rainbow && item.color === defaultColor) {
+                    // Duhový efekt pro spirály — tady po jednotlivých úsecích
+                    const p = item.points;
+                    for (let i = 2; i < p.length; i += 2, segmentIndex++) {
+                        ctx.beginPath();
+                        ctx.moveTo(cx + p[i - 2], cy - p[i - 1]);
+                        ctx.lineTo(cx + p[i], cy - p[i + 1]);
+                        ctx.strokeStyle = `hsl(${(segmentIndex * 360 / segments) % 360}, 70%, 50%)`;
+                        ctx.stroke();
+                    }
+                } else {
+                    tracePath(item.points);
+                    ctx.strokeStyle = item.color;
+                    ctx.stroke();
+                    segmentIndex += item.points.length / 2 - 1;
+                }
+                break;
+            case 2:
+                tracePath(item.points);
+                ctx.closePath();
+                ctx.fillStyle = item.color;
+                ctx.fill();
+                break;
+            case 3:
+                ctx.beginPath();
+                ctx.arc(cx + item.x, cy - item.y, item.size / 2, 0, 2 * Math.PI);
+                ctx.fillStyle = item.color;
+                ctx.fill();
+                break;
+            case 4:
+                ctx.font = `${Math.max(8, item.size) * 1.5}px Arial`;
+                ctx.textAlign = item.align;
+                ctx.fillStyle = item.color;
+                ctx.fillText(item.text, cx + item.x, cy - item.y);
+                break;
+            case 5:
+                ctx.save();
+                ctx.globalCompositeOperation = 'destination-over';
+                ctx.fillStyle = item.color;
+                ctx.fillRect(0, 0, canvas.width, canvas.height);
+                ctx.restore();
+                break;
+        }
+    });
+}
+
+// Spustí program na serveru; binární kresbu si vyžádá přes Accept.
+// Vrátí {success, output, error, commands} nebo {success, output, drawing}.
+async function runTurtleProgram(code) {
+    const response = await fetch('/api/run-python', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': `${TURTLE_POLYLINE_TYPE}, application/json`
+        },
+        body: JSON.stringify({ code: code })
+    });
+    const contentType = response.headers.get('Content-Type') || '';
+    if (contentType.startsWith(TURTLE_POLYLINE_TYPE)) {
+        const drawing = decodeTurtlePolyline(await response.arrayBuffer());
+        return { success: true, output: drawing.output, drawing };
+    }
+    return await response.json();
+}
+
+// Vykreslí výsledek runTurtleProgram (binární kresbu i JSON příkazy)
+function renderTurtleResult(canvas, result, options = {}) {
+    if (result.drawing) {
+        renderTurtlePolyline(canvas, result.drawing, options);
+    } else {
+        renderTurtleCommands(canvas, result.commands || [], options);
+    }
+}
@@ -0,0 +1,207 @@
+"""
+Šablony Jinja2: perzistentní bytecode cache, zahřátí při startu a cache
+vyrenderovaného HTML.
+
+Zkompilované šablony se ukládají do TEMPLATE_CACHE_DIR (při buildu je tam
+předem zapíše precompile_templates.py), takže nový worker jen načte
+bytecode místo parsování a kompilace. Při startu se navíc všechny šablony
+načtou do paměti prostředí — první požadavek už nic nekompiluje.
+
+Hotové HTML se cachuje ve dvou úrovních:
+- PageCache — celé stránky pro nepřihlášené (ti vidí všichni totéž)
+- {% cache "název", klíč... %}…{% endcache %} — části stránky, které jsou
+  stejné pro všechny uživatele (karty kurzů, obsah playgroundu)
+Klíč obou obsahuje verzi šablon (nejnovější mtime v adresáři), takže úprava
+šablony starý obsah hned zneplatní.
+"""
+
+import os
+import time
+from typing import Dict, Iterable, Optional
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from assets import AssetManifest
+from cache import TTLCache
+from config import settings
+
+class TemplateBytecodeCache(FileSystemBytecodeCache):
+    """FileSystemBytecodeCache s počítadly; na read-only disku (Vercel) jen nezapisuje."""
+
+    def __init__(self, directory: str):
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError:
+            pass
+        super().__init__(directory, pattern="%s.jinja")
+        self.hits = 0
+        self.misses = 0
+        self.dumps = 0
+        self.write_errors = 0
+
+    def load_bytecode(self, bucket):
+        super().load_bytecode(bucket)
+        if bucket.code is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+            self.dumps += 1
+        except OSError:
+            self.write_errors += 1
+
+    def stats(self) -> Dict:
+        return {"directory": self.directory, "hits": self.hits, "misses": self.misses,
+                "dumps": self.dumps, "write_errors": self.write_errors}
+
+class TemplateVersion:
+    """Verze šablon = nejnovější mtime v adresáři (kontrolováno nejvýš každých `check_interval` s)."""
+
+    def __init__(self, directory: str, check_interval: float = 2.0, extra_files: Iterable[str] = ()):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.extra_files = list(extra_files)   # např. manifest assetů — mění adresy v HTML
+        self._version = ""
+        self._checked_at = float("-inf")
+
+    def get(self) -> str:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            latest = 0
+            paths = [os.path.join(root, name) for root, _, files in os.walk(self.directory) for name in files]
+            for path in paths + self.extra_files:
+                try:
+                    latest = max(latest, os.stat(path).st_mtime_ns)
+                except OSError:
+                    pass
+            self._version = format(latest, "x")
+            self._checked_at = now
+        return self._version
+
+class FragmentCacheExtension(Extension):
+    """Tag {% cache "název", klíč... %} — výsledek bloku se uloží do env.fragment_cache."""
+
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None, template_version=None, fragment_hits=0, fragment_misses=0)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [nodes.Const(parser.name), parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(self.call_method("_render", [nodes.List(args)]), [], [], body).set_lineno(lineno)
+
+    def _render(self, key_parts, caller):
+        env = self.environment
+        if env.fragment_cache is None:
+            return caller()
+        key = "|".join([env.template_version.get()] + [str(part) for part in key_parts])
+        html = env.fragment_cache.get(key)
+        if html is not None:
+            env.fragment_hits += 1
+            return Markup(html)
+        env.fragment_misses += 1
+        html = caller()
+        env.fragment_cache.set(key, str(html))
+        return html
+
+def make_templates(directory: str = "templates", assets: Optional[AssetManifest] = None) -> Jinja2Templates:
+    templates = Jinja2Templates(directory=directory)
+    env = templates.env
+    env.bytecode_cache = TemplateBytecodeCache(settings.TEMPLATE_CACHE_DIR)
+    env.auto_reload = settings.TEMPLATE_AUTO_RELOAD
+    env.add_extension(FragmentCacheExtension)
+    env.template_version = TemplateVersion(directory, 2.0 if settings.TEMPLATE_AUTO_RELOAD else float("inf"),
+                                           extra_files=[assets.path] if assets else [])
+    # {{ asset_url('css/style.css') }} → /static/dist/css/style.<hash>.css
+    env.globals["asset_url"] = assets.url if assets else (lambda path: "/static/" + path.lstrip("/"))
+    env.fragment_cache = TTLCache(default_ttl=settings.PAGE_CACHE_TTL, max_size=settings.FRAGMENT_CACHE_SIZE)
+    return templates
+
+def _ratio(hits: int, misses: int) -> float:
+    return round(hits / (hits + misses), 3) if hits + misses else 0.0
+
+class PageCache:
+    """Celé HTML stránky pro nepřihlášené; přihlášeným se renderuje (s cachovanými fragmenty)."""
+
+    def __init__(self, templates: Jinja2Templates, ttl: int = 300, max_size: int = 500):
+        self.templates = templates
+        self._pages = TTLCache(default_ttl=ttl, max_size=max_size)
+        self.hits = 0
+        self.misses = 0
+        self.rendered = 0   # přihlášení / necachovatelné požadavky
+
+    def render(self, request: Request, name: str, context: Dict, vary: Iterable = ()) -> Response:
+        """TemplateResponse, ale anonymní GET bez query se vrátí z cache.
+
+        `vary` — další hodnoty, na kterých výsledek závisí (kromě šablony, adresy
+        a hostitele).
+        """
+        if context.get("user") or request.method != "GET" or request.query_params:
+            self.rendered += 1
+            return self.templates.TemplateResponse(name, context)
+        # Cesta: jedna šablona slouží víc adresám (coming_soon.html pro všechny /kurz/*)
+        # base_url: url_for v šablonách generuje absolutní adresy
+        key = "|".join([name, self.templates.env.template_version.get(), str(request.base_url),
+                        request.url.path] + [str(v) for v in vary])
+        body = self._pages.get(key)
+        if body is not None:
+            self.hits += 1
+            return HTMLResponse(body)
+        self.misses += 1
+        response = self.templates.TemplateResponse(name, context)
+        if response.status_code == 200:
+            self._pages.set(key, response.body)
+        return response
+
+    def clear(self):
+        self._pages.clear()
+        self.templates.env.fragment_cache.clear()
+
+    def stats(self) -> Dict:
+        env = self.templates.env
+        views = self.hits + self.misses + self.rendered
+        return {
+            "views": views,
+            "served_from_cache": round(self.hits / views, 3) if views else 0.0,
+            "pages": {"hits": self.hits, "misses": self.misses, "hit_ratio": _ratio(self.hits, self.misses),
+                      "size": len(self._pages)},
+            "fragments": {"hits": env.fragment_hits, "misses": env.fragment_misses,
+                          "hit_ratio": _ratio(env.fragment_hits, env.fragment_misses),
+                          "size": len(env.fragment_cache)},
+            "template_version": env.template_version.get(),
+        }
+
+def warm_up(templates: Jinja2Templates) -> Dict:
+    """Načte (a případně zkompiluje) všechny šablony. Vrátí časy v ms."""
+    env = templates.env
+    timings: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+    started = time.perf_counter()
+    for name in env.list_templates(extensions=["html"]):
+        t0 = time.perf_counter()
+        try:
+            env.get_template(name)
+        except Exception as e:
+            errors[name] = str(e)
+            continue
+        timings[name] = round((time.perf_counter() - t0) * 1000, 2)
+    report = {
+        "templates": len(timings),
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        "slowest": dict(sorted(timings.items(), key=lambda item: -item[1])[:5]),
+        "bytecode_cache": env.bytecode_cache.stats() if env.bytecode_cache else None,
+    }
+    if errors:
+        report["errors"] = errors
+    return report
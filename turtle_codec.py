@@ -0,0 +1,229 @@
+"""
+Kompaktní binární formát kresby želvy (application/x-turtle-polyline).
+
+Místo seznamu příkazů ({"type": "forward", ...}) server želvu rovnou
+odsimuluje a pošle hotovou geometrii: lomené čáry, výplně, tečky a texty.
+Body čar jsou delta-kódované v desetinách pixelu (Int16), takže spirála
+s tisíci úseky má pár kB a prohlížeč ji vykreslí jedním stroke() na čáru.
+
+Formát (little-endian, všechny sekce zarovnané na 4 bajty, aby šly číst
+přes typed arrays):
+
+    hlavička   'NGT1' | uint32 items | uint32 string_bytes | int32 output_idx
+    řetězce    UTF-8 JSON pole (barvy, texty, výstup programu), doplněné mezerami
+    položky    int32[4] kind, a, b, count  + data podle druhu:
+      1 čára   a=barva, b=šířka*100, count=bodů; float32[2] první bod, int16[2*(count-1)] delty
+      2 výplň  a=barva, b=0,         count=bodů; body stejně jako u čáry
+      3 tečka  a=barva, b=průměr*100, count=1;   float32[2] bod
+      4 text   a=barva, b=text,      count=1;    int32[2] velikost*100, zarovnání; float32[2] bod
+      5 pozadí a=barva, b=0,         count=0
+
+Za každou sekcí s int16 daty je výplň na násobek 4 bajtů.
+"""
+
+import json
+import math
+import struct
+from typing import Dict, List, Optional, Tuple
+
+MEDIA_TYPE = "application/x-turtle-polyline"
+MAGIC = b"NGT1"
+SCALE = 10           # delty v desetinách pixelu
+MAX_DELTA = 32767    # rozsah int16
+# Příkazy pocházejí ze studentského procesu — geometrii omezíme i tady
+MAX_COORD = 10_000       # px od středu, dál se souřadnice ořízne
+MAX_CIRCLE_STEPS = 360   # jako turtle_shim.MAX_CIRCLE_STEPS
+MAX_POINTS = 100_000
+MAX_BYTES = 1_000_000
+ALIGN = {"left": 0, "center": 1, "right": 2}
+
+KIND_STROKE = 1
+KIND_FILL = 2
+KIND_DOT = 3
+KIND_TEXT = 4
+KIND_BACKGROUND = 5
+
+class PolylineTooLarge(ValueError):
+    """Kresba je na binární formát příliš velká — volající pošle JSON."""
+
+def wants_polyline(accept: Optional[str]) -> bool:
+    """Klient umí binární formát (uvedl ho v hlavičce Accept)."""
+    return bool(accept) and MEDIA_TYPE in accept
+
+class _TurtleState:
+    def __init__(self, color: str):
+        self.x = 0.0
+        self.y = 0.0
+        self.heading = 0.0
+        self.down = True
+        self.color = color
+        self.fill_color = color
+        self.width = 2.0
+        self.stroke: Optional[Dict] = None     # rozpracovaná čára
+        self.fill: Optional[Dict] = None       # rozpracovaná výplň
+
+def to_geometry(commands: List[Dict], default_color: str = "#3B82F6") -> List[Dict]:
+    """Odsimuluje příkazy (stejně jako turtle_canvas.js) a vrátí seznam položek kresby."""
+    items: List[Dict] = []
+    turtles: Dict[int, _TurtleState] = {}
+    points = 0
+
+    def state(turtle_id: int) -> _TurtleState:
+        if turtle_id not in turtles:
+            turtles[turtle_id] = _TurtleState(default_color)
+        return turtles[turtle_id]
+
+    def end_stroke(t: _TurtleState):
+        t.stroke = None
+
+    def move(t: _TurtleState, nx: float, ny: float):
+        nonlocal points
+        nx = min(max(nx, -MAX_COORD), MAX_COORD)
+        ny = min(max(ny, -MAX_COORD), MAX_COORD)
+        points += 1
+        if points > MAX_POINTS:
+            raise PolylineTooLarge(f"Kresba má víc než {MAX_POINTS} bodů")
+        if t.down:
+            if t.stroke is None:
+                t.stroke = {"kind": KIND_STROKE, "color": t.color, "width": t.width, "points": [(t.x, t.y)]}
+                items.append(t.stroke)
+            t.stroke["points"].append((nx, ny))
+        if t.fill is not None:
+            t.fill["points"].append((nx, ny))
+        t.x, t.y = nx, ny
+
+    def forward(t: _TurtleState, distance: float):
+        rad = math.radians(t.heading)
+        move(t, t.x + distance * math.cos(rad), t.y + distance * math.sin(rad))
+
+    for cmd in commands:
+        t = state(cmd.get("turtle", 0))
+        kind = cmd.get("type")
+        if kind == "forward":
+            forward(t, cmd["distance"])
+        elif kind == "right":
+            t.heading -= cmd["degrees"]
+        elif kind == "left":
+            t.heading += cmd["degrees"]
+        elif kind == "goto":
+            move(t, cmd["x"], cmd["y"])
+        elif kind == "circle":
+            steps = min(max(1, int(cmd["steps"])), MAX_CIRCLE_STEPS)
+            w = cmd["extent"] / steps
+            w2 = w / 2
+            length = 2 * cmd["radius"] * math.sin(math.radians(w2))
+            if cmd["radius"] < 0:
+                length, w, w2 = -length, -w, -w2
+            t.heading += w2
+            for _ in range(steps):
+                forward(t, length)
+                t.heading += w
+            t.heading -= w2
+        elif kind == "penup":
+            t.down = False
+            end_stroke(t)
+        elif kind == "pendown":
+            t.down = True
+        elif kind == "color":
+            t.color = cmd["color"]
+            end_stroke(t)
+        elif kind == "fillcolor":
+            t.fill_color = cmd["color"]
+        elif kind == "width":
+            t.width = float(cmd["width"])
+            end_stroke(t)
+        elif kind == "begin_fill":
+            # Výplň leží pod čarami nakreslenými během begin_fill/end_fill (jako v Tk)
+            t.fill = {"kind": KIND_FILL, "color": t.fill_color, "points": [(t.x, t.y)]}
+            items.append(t.fill)
+            end_stroke(t)
+        elif kind == "end_fill":
+            if t.fill is not None:
+                t.fill["color"] = t.fill_color
+                if len(t.fill["points"]) < 3:
+                    items.remove(t.fill)
+            t.fill = None
+        elif kind == "dot":
+            items.append({"kind": KIND_DOT, "color": cmd.get("color", t.color), "size": cmd["size"],
+                          "points": [(t.x, t.y)]})
+            end_stroke(t)
+        elif kind == "write":
+            items.append({"kind": KIND_TEXT, "color": t.color, "text": cmd["text"], "size": cmd.get("size", 8),
+                          "align": cmd.get("align", "left"), "points": [(t.x, t.y)]})
+            end_stroke(t)
+        elif kind == "bgcolor":
+            items.append({"kind": KIND_BACKGROUND, "color": cmd["color"], "points": []})
+        elif kind == "clear":
+            items.clear()
+            for other in turtles.values():
+                other.stroke = None
+                other.fill = None
+    return items
+
+def _pad4(data: bytes, fill: bytes = b"\0") -> bytes:
+    return data + fill * (-len(data) % 4)
+
+def _encode_points(points: List[Tuple[float, float]]) -> Tuple[bytes, int]:
+    """První bod absolutně (float32), další jako int16 delty v desetinách px.
+
+    Příliš dlouhé úseky se rozdělí vloženými body, aby se delta vešla do int16.
+    """
+    qx, qy = round(points[0][0] * SCALE), round(points[0][1] * SCALE)
+    data = struct.pack("<2f", qx / SCALE, qy / SCALE)
+    deltas: List[int] = []
+    for x, y in points[1:]:
+        tx, ty = round(x * SCALE), round(y * SCALE)
+        dx, dy = tx - qx, ty - qy
+        parts = max(1, math.ceil(max(abs(dx), abs(dy)) / MAX_DELTA))
+        prev_x, prev_y = qx, qy
+        for i in range(1, parts + 1):
+            nx, ny = qx + dx * i // parts, qy + dy * i // parts
+            deltas.extend((nx - prev_x, ny - prev_y))
+            prev_x, prev_y = nx, ny
+        qx, qy = tx, ty
+    data += _pad4(struct.pack(f"<{len(deltas)}h", *deltas))
+    return data, 1 + len(deltas) // 2
+
+def encode_polyline(commands: List[Dict], output: str = "") -> bytes:
+    """Zakóduje příkazy želvy do binárního formátu NGT1.
+
+    Nad MAX_POINTS bodů nebo MAX_BYTES bajtů vyhodí PolylineTooLarge.
+    """
+    items = to_geometry(commands)
+    strings: List[str] = []
+    index: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        if value not in index:
+            index[value] = len(strings)
+            strings.append(value)
+        return index[value]
+
+    body = bytearray()
+    count = 0
+    for item in items:
+        kind = item["kind"]
+        color = intern(item["color"])
+        if kind in (KIND_STROKE, KIND_FILL):
+            if len(item["points"]) < 2:
+                continue
+            data, npoints = _encode_points(item["points"])
+            b = round(item["width"] * 100) if kind == KIND_STROKE else 0
+            body += struct.pack("<4i", kind, color, b, npoints) + data
+        elif kind == KIND_DOT:
+            x, y = item["points"][0]
+            body += struct.pack("<4i2f", kind, color, round(item["size"] * 100), 1, x, y)
+        elif kind == KIND_TEXT:
+            x, y = item["points"][0]
+            body += struct.pack("<4i2i2f", kind, color, intern(item["text"]), 1,
+                                round(item["size"] * 100), ALIGN.get(item["align"], 0), x, y)
+        elif kind == KIND_BACKGROUND:
+            body += struct.pack("<4i", kind, color, 0, 0)
+        count += 1
+        if len(body) > MAX_BYTES:
+            raise PolylineTooLarge(f"Kresba má víc než {MAX_BYTES} B")
+
+    output_idx = intern(output) if output else -1
+    string_bytes = _pad4(json.dumps(strings, ensure_ascii=False).encode("utf-8"), b" ")
+    header = MAGIC + struct.pack("<IIi", count, len(string_bytes), output_idx)
+    return header + string_bytes + bytes(body)
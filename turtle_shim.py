@@ -0,0 +1,371 @@
+"""
+Záznamová náhrada modulu `turtle` pro sandbox.
+
+Studentský program běží normálně (smyčky, funkce, proměnné), ale místo
+kreslení do okna se pohyby želvy zaznamenávají jako kompaktní proud
+příkazů, které pak vykreslí canvas v lekci:
+
+    {"type": "forward", "distance": 100}
+    {"type": "right", "degrees": 90}
+    {"type": "goto", "x": 0, "y": 50}
+    {"type": "circle", "radius": 40, "extent": 360, "steps": 18}
+    ...
+
+Příkazy jiné než výchozí želvy nesou navíc klíč "turtle" (index želvy).
+Souřadnice i úhly jsou v konvenci modulu turtle (0° = východ, kladně
+proti směru hodinových ručiček, osa y nahoru).
+"""
+
+import math
+import sys
+import types
+
+# Kreslicí plocha má pár set px — dál to nemá smysl (a zahltilo by to canvas)
+MAX_DISTANCE = 10_000
+MAX_CIRCLE_STEPS = 360
+
+class TurtleLimitExceeded(BaseException):
+    """Program překročil limit kroků nebo příkazů (BaseException, aby ho
+    studentský `except Exception` nespolkl)."""
+
+class Recorder:
+    """Sbírá příkazy, slučuje navazující otočení/pohyby a posílá je po dávkách."""
+
+    BATCH = 500
+
+    def __init__(self, emit, max_commands: int):
+        self._emit = emit
+        self.max_commands = max_commands
+        self.count = 0
+        self._pending = []
+
+    def add(self, turtle_id: int, command: dict, cost: int = 1):
+        """`cost` — kolik příkazů se započítá do limitu (kružnice = počet úseků)."""
+        if turtle_id:
+            command["turtle"] = turtle_id
+        last = self._pending[-1] if self._pending else None
+        if last is not None and last.get("turtle", 0) == turtle_id:
+            kind = command["type"]
+            if kind in ("right", "left") and last["type"] in ("right", "left"):
+                sign = 1 if last["type"] == "right" else -1
+                delta = command["degrees"] if kind == "right" else -command["degrees"]
+                total = sign * last["degrees"] + delta
+                last["type"], last["degrees"] = ("right", total) if total >= 0 else ("left", -total)
+                if not total:
+                    self._pending.pop()
+                return
+            if kind == "forward" and last["type"] == "forward":
+                last["distance"] += command["distance"]
+                return
+            if kind == "speed" and last["type"] == "speed":
+                last["speed"] = command["speed"]
+                return
+        self.count += cost
+        if self.count > self.max_commands:
+            raise TurtleLimitExceeded(f"Příliš mnoho kreslicích příkazů (limit {self.max_commands}).")
+        self._pending.append(command)
+        if len(self._pending) > self.BATCH:
+            # Poslední příkaz necháme čekat — může se ještě sloučit s dalším
+            self._emit(self._pending[:-1])
+            self._pending = self._pending[-1:]
+
+    def flush(self):
+        if self._pending:
+            self._emit(self._pending)
+            self._pending = []
+
+def _num(value, limit: float = None) -> float:
+    value = float(value)
+    if math.isnan(value) or math.isinf(value):
+        raise ValueError("Neplatné číslo pro želvu")
+    if limit is not None and abs(value) > limit:
+        raise ValueError(f"Příliš velké číslo pro želvu: {value:g} (max {limit:g})")
+    return round(value, 3) if value != int(value) else int(value)
+
+def _color_arg(args):
+    """Převede argumenty color()/pencolor() na CSS barvu."""
+    if len(args) == 1:
+        args = args[0]
+        if isinstance(args, str):
+            return args
+    if isinstance(args, (tuple, list)) and len(args) == 3:
+        r, g, b = args
+        if all(isinstance(c, float) and c <= 1.0 for c in (r, g, b)):
+            r, g, b = (int(c * 255) for c in (r, g, b))
+        return f"rgb({int(r)}, {int(g)}, {int(b)})"
+    raise ValueError(f"Neznámá barva: {args!r}")
+
+class Turtle:
+    _recorder: Recorder = None
+    _count = 0
+
+    def __init__(self, *args, **kwargs):
+        self._id = Turtle._count
+        Turtle._count += 1
+        self._x = 0.0
+        self._y = 0.0
+        self._heading = 0.0
+        self._down = True
+        self._pencolor = "black"
+        self._fillcolor = "black"
+        self._width = 1
+
+    def _add(self, command: dict, cost: int = 1):
+        Turtle._recorder.add(self._id, command, cost)
+
+    # ── Pohyb ─────────────────────────────────────────────────────────────────
+
+    def forward(self, distance):
+        distance = _num(distance, MAX_DISTANCE)
+        if distance:
+            rad = math.radians(self._heading)
+            self._x += distance * math.cos(rad)
+            self._y += distance * math.sin(rad)
+            self._add({"type": "forward", "distance": distance})
+
+    def backward(self, distance):
+        self.forward(-_num(distance))
+
+    def right(self, angle):
+        angle = _num(angle)
+        if angle:
+            self._heading = (self._heading - angle) % 360
+            self._add({"type": "right", "degrees": angle})
+
+    def left(self, angle):
+        angle = _num(angle)
+        if angle:
+            self._heading = (self._heading + angle) % 360
+            self._add({"type": "left", "degrees": angle})
+
+    def goto(self, x, y=None):
+        if y is None:
+            x, y = x
+        x, y = _num(x, MAX_DISTANCE), _num(y, MAX_DISTANCE)
+        self._x, self._y = float(x), float(y)
+        self._add({"type": "goto", "x": x, "y": y})
+
+    def setx(self, x):
+        self.goto(x, self._y)
+
+    def sety(self, y):
+        self.goto(self._x, y)
+
+    def setheading(self, angle):
+        self.left((_num(angle) - self._heading + 180) % 360 - 180)
+
+    def home(self):
+        self.goto(0, 0)
+        self.setheading(0)
+
+    def circle(self, radius, extent=None, steps=None):
+        radius = _num(radius, MAX_DISTANCE)
+        extent = 360 if extent is None else _num(extent)
+        if steps is None:
+            frac = abs(extent) / 360
+            steps = 1 + int(min(11 + abs(radius) / 6.0, 59.0) * frac)
+        # Jemnější mnohoúhelník už na plátně nejde poznat
+        steps = min(max(1, int(steps)), MAX_CIRCLE_STEPS)
+        # Stejná geometrie jako CPython turtle: mnohoúhelník o `steps` stranách
+        w = extent / steps
+        w2 = 0.5 * w
+        length = 2.0 * radius * math.sin(math.radians(w2))
+        if radius < 0:
+            length, w, w2 = -length, -w, -w2
+        self._heading += w2
+        for _ in range(steps):
+            rad = math.radians(self._heading)
+            self._x += length * math.cos(rad)
+            self._y += length * math.sin(rad)
+            self._heading += w
+        self._heading = (self._heading - w2) % 360
+        self._add({"type": "circle", "radius": radius, "extent": extent, "steps": steps}, cost=steps)
+
+    def dot(self, size=None, *color):
+        command = {"type": "dot", "size": _num(size) if size is not None else max(self._width + 4, self._width * 2)}
+        if color:
+            command["color"] = _color_arg(color)
+        self._add(command)
+
+    def write(self, arg, move=False, align="left", font=("Arial", 8, "normal")):
+        self._add({"type": "write", "text": str(arg), "align": align, "size": font[1] if len(font) > 1 else 8})
+
+    # ── Pero a barvy ──────────────────────────────────────────────────────────
+
+    def penup(self):
+        if self._down:
+            self._down = False
+            self._add({"type": "penup"})
+
+    def pendown(self):
+        if not self._down:
+            self._down = True
+            self._add({"type": "pendown"})
+
+    def isdown(self) -> bool:
+        return self._down
+
+    def pensize(self, width=None):
+        if width is None:
+            return self._width
+        self._width = _num(width)
+        self._add({"type": "width", "width": self._width})
+
+    def pencolor(self, *args):
+        if not args:
+            return self._pencolor
+        self._pencolor = _color_arg(args)
+        self._add({"type": "color", "color": self._pencolor})
+
+    def fillcolor(self, *args):
+        if not args:
+            return self._fillcolor
+        self._fillcolor = _color_arg(args)
+        self._add({"type": "fillcolor", "color": self._fillcolor})
+
+    def color(self, *args):
+        if not args:
+            return self._pencolor, self._fillcolor
+        if len(args) == 2 and not all(isinstance(a, (int, float)) for a in args):
+            self.pencolor(args[0])
+            self.fillcolor(args[1])
+        else:
+            self.pencolor(*args)
+            self.fillcolor(*args)
+
+    def begin_fill(self):
+        self._add({"type": "begin_fill"})
+
+    def end_fill(self):
+        self._add({"type": "end_fill"})
+
+    def speed(self, speed=None):
+        if speed is None:
+            return 0
+        self._add({"type": "speed", "speed": speed if isinstance(speed, str) else _num(speed)})
+
+    # ── Stav ──────────────────────────────────────────────────────────────────
+
+    def position(self):
+        return (round(self._x, 6), round(self._y, 6))
+
+    def xcor(self):
+        return round(self._x, 6)
+
+    def ycor(self):
+        return round(self._y, 6)
+
+    def heading(self):
+        return round(self._heading, 6)
+
+    def distance(self, x, y=None):
+        if y is None:
+            x, y = x
+        return math.hypot(x - self._x, y - self._y)
+
+    def towards(self, x, y=None):
+        if y is None:
+            x, y = x
+        return math.degrees(math.atan2(y - self._y, x - self._x)) % 360
+
+    def clear(self):
+        self._add({"type": "clear"})
+
+    def reset(self):
+        self.clear()
+        self.penup()
+        self.home()
+        self.pendown()
+
+    # Želva se nevykresluje — tyto metody nic nedělají
+    def hideturtle(self):
+        pass
+
+    def showturtle(self):
+        pass
+
+    def shape(self, name=None):
+        return "classic"
+
+    def isvisible(self) -> bool:
+        return False
+
+    # Zkratky jako v modulu turtle
+    fd = forward
+    bk = back = backward
+    rt = right
+    lt = left
+    setpos = setposition = goto
+    seth = setheading
+    pu = up = penup
+    pd = down = pendown
+    width = pensize
+    pos = position
+    ht = hideturtle
+    st = showturtle
+
+class _Screen:
+    def bgcolor(self, *args):
+        if args:
+            Turtle._recorder.add(0, {"type": "bgcolor", "color": _color_arg(args)})
+
+    def _noop(self, *args, **kwargs):
+        return None
+
+    setup = title = tracer = update = exitonclick = mainloop = done = bye = _noop
+    listen = onkey = onkeypress = onclick = ontimer = delay = colormode = _noop
+
+_screen = _Screen()
+
+def Screen():
+    return _screen
+
+_TURTLE_METHODS = [
+    "forward", "fd", "backward", "bk", "back", "right", "rt", "left", "lt",
+    "goto", "setpos", "setposition", "setx", "sety", "setheading", "seth", "home",
+    "circle", "dot", "write", "penup", "pu", "up", "pendown", "pd", "down", "isdown",
+    "pensize", "width", "pencolor", "fillcolor", "color", "begin_fill", "end_fill",
+    "speed", "position", "pos", "xcor", "ycor", "heading", "distance", "towards",
+    "clear", "reset", "hideturtle", "ht", "showturtle", "st", "shape", "isvisible",
+]
+
+def install(emit, max_commands: int) -> Recorder:
+    """Zaregistruje modul `turtle` v sys.modules. Vrátí recorder (kvůli flush())."""
+    recorder = Recorder(emit, max_commands)
+    Turtle._recorder = recorder
+    Turtle._count = 0
+    default = Turtle()
+
+    module = types.ModuleType("turtle")
+    module.Turtle = module.Pen = module.RawTurtle = Turtle
+    module.Screen = Screen
+    module.TurtleLimitExceeded = TurtleLimitExceeded
+    for name in _TURTLE_METHODS:
+        setattr(module, name, getattr(default, name))
+    for name in ("bgcolor", "setup", "title", "tracer", "update", "exitonclick",
+                 "mainloop", "done", "bye", "listen", "onkey", "onkeypress", "ontimer", "delay", "colormode"):
+        setattr(module, name, getattr(_screen, name))
+    module.__all__ = ["Turtle", "Pen", "RawTurtle", "Screen"] + _TURTLE_METHODS + [
+        "bgcolor", "setup", "title", "tracer", "update", "exitonclick", "mainloop", "done", "bye",
+    ]
+    sys.modules["turtle"] = module
+    return recorder
+
+def step_budget(max_steps: int, filename: str = "<student>"):
+    """Trace funkce, která počítá řádky studentského kódu a po `max_steps` ho zastaví."""
+    counter = [0]
+
+    def local_trace(frame, event, arg):
+        if event == "line":
+            counter[0] += 1
+            if counter[0] > max_steps:
+                raise TurtleLimitExceeded(
+                    f"Program udělal příliš mnoho kroků (limit {max_steps}) — nemáš nekonečnou smyčku?"
+                )
+        return local_trace
+
+    def global_trace(frame, event, arg):
+        # Trasujeme jen rámce studentského kódu, modul želvy běží naplno
+        return local_trace if frame.f_code.co_filename == filename else None
+
+    return global_trace